@@ -0,0 +1,4 @@
+import time
+
+# imports of the application begin here, see app.utils.startup
+IMPORT_START = time.perf_counter()
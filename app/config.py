@@ -1,11 +1,80 @@
-import os
 from functools import lru_cache
+from typing import Literal
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
-from pydantic import BaseSettings
+from pydantic import BaseSettings, validator
 
 
 class Config(BaseSettings):
-    sqlite_host: str = os.environ['SQLITE_HOST']
+    sqlite_host: str
+    sqlite_journal_mode: str = 'WAL'
+    sqlite_synchronous: str = 'NORMAL'
+    sqlite_cache_size: int = -65536
+    sqlite_mmap_size: int = 268435456
+    sqlite_busy_timeout: int = 5000
+    sqlite_temp_store: str = 'MEMORY'
+    sqlite_readers: int = 4
+    token_mode: Literal['opaque', 'signed'] = 'opaque'
+    token_secret: str = ''
+    token_revocation_sync_interval: int = 5
+    token_cache_size: int = 4096
+    token_cache_ttl: int = 60
+    token_limit_per_user: int = 10
+    token_purge_interval: int = 600
+    token_purge_batch_size: int = 1000
+    password_pool_size: int = 4
+    password_queue_limit: int = 64
+    response_cache_backend: Literal['memory', 'sqlite', 'none'] = 'memory'
+    response_cache_path: str = 'response_cache.sqlite3'
+    response_cache_max_bytes: int = 67108864
+    fast_serialization: bool = False
+    instrumentation: bool = True
+    metrics_sample_interval: float = 5
+    rate_limit_backend: Literal['memory', 'sqlite', 'none'] = 'memory'
+    rate_limit_path: str = 'rate_limits.sqlite3'
+    rate_limit_max_keys: int = 100000
+    rate_limit_ip_per_minute: float = 30
+    rate_limit_ip_burst: int = 10
+    rate_limit_email_per_minute: float = 5
+    rate_limit_email_burst: int = 5
+    compression: bool = True
+    compression_minimum_size: int = 1024
+    compression_thread_size: int = 262144
+    compression_gzip_level: int = 6
+    compression_zstd_level: int = 3
+    startup_mode: Literal['development', 'production'] = 'development'
+    bulk_chunk_size: int = 1000
+    export_chunk_size: int = 500
+
+    @validator('token_secret')
+    def check_token_secret(cls, value: str, values: dict) -> str:
+        if values.get('token_mode') == 'signed' and len(value) < 32:
+            raise ValueError('at least 32 characters are required '
+                             'for signed tokens')
+        return value
+
+    @property
+    def sqlite_pragmas(self) -> dict[str, str | int]:
+        """Pragmas applied to every new database connection."""
+        return {
+            'busy_timeout': self.sqlite_busy_timeout,
+            'journal_mode': self.sqlite_journal_mode,
+            'synchronous': self.sqlite_synchronous,
+            'cache_size': self.sqlite_cache_size,
+            'mmap_size': self.sqlite_mmap_size,
+            'temp_store': self.sqlite_temp_store,
+        }
+
+    @property
+    def database_url(self) -> str:
+        """Return sqlite_host with pragmas as query parameters.
+
+        Tortoise executes every query parameter of sqlite url as pragma on
+        connection, parameters given in sqlite_host take precedence.
+        """
+        url = urlsplit(self.sqlite_host)
+        params = {**self.sqlite_pragmas, **dict(parse_qsl(url.query))}
+        return urlunsplit(url._replace(query=urlencode(params)))
 
 
 @lru_cache()
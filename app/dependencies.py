@@ -1,3 +1,4 @@
+from datetime import timedelta
 from typing import cast
 
 from fastapi import Depends, HTTPException, status
@@ -5,17 +6,76 @@ from fastapi.security import OAuth2PasswordBearer
 from tortoise import timezone
 from tortoise.exceptions import DoesNotExist
 
+from app.config import config
 from app.models.authentication import AccessTokenTortoise, UserTortoise
+from app.utils.cache import TTLCache
+from app.utils.instrumentation import measured
+from app.utils.tokens import (Revocation, get_opaque_token_id,
+                              read_signed_token, revoked_tokens)
 
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl='/token')
 
+# Maps access token to (user, expiration) of already resolved tokens.
+token_cache = TTLCache(maxsize=config.token_cache_size,
+                       ttl=config.token_cache_ttl)
+
+
+@measured('auth')
 async def get_current_user(
-    token: str = Depends(OAuth2PasswordBearer(tokenUrl='/token'))
+    token: str = Depends(oauth2_scheme)
 ) -> UserTortoise:
-    """Return user if authenticated, 401 otherwise."""
+    """Return user if authenticated, 401 otherwise.
+
+    Signed tokens are verified without database access, the user is a
+    partial instance holding only id, like one fetched with `.only('id')`.
+    """
+    signed_token = read_signed_token(token)
+    if signed_token is not None:
+        if (signed_token.expiration < timezone.now()
+                or signed_token.token_id in revoked_tokens):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+        return UserTortoise._init_from_db(id=signed_token.user_id)
+
+    cached = token_cache.get(token)
+    if cached is not None:
+        user, expiration = cached
+        # revoked by another process since it was cached
+        revoked = (bool(revoked_tokens)
+                   and get_opaque_token_id(token) in revoked_tokens)
+        if expiration >= timezone.now() and not revoked:
+            return user
+        token_cache.invalidate(token)
+
     try:
         access_token: AccessTokenTortoise = await AccessTokenTortoise.get(
             access_token=token, expiration__gte=timezone.now()
         ).prefetch_related('user')
-        return cast(UserTortoise, access_token.user)
     except DoesNotExist:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+
+    user = cast(UserTortoise, access_token.user)
+    token_cache.set(token, (user, access_token.expiration))
+    return user
+
+
+async def revoke_access_tokens(*tokens: str) -> int:
+    """Delete access tokens, drop them from cache and revoke them.
+
+    Revocations of opaque tokens are kept as long as other processes could
+    serve the tokens from their caches.
+    """
+    token_cache.invalidate(*tokens)
+    cached_until = timezone.now() + timedelta(seconds=config.token_cache_ttl)
+    revocations = []
+    for token in tokens:
+        signed_token = read_signed_token(token)
+        if signed_token is not None:
+            revocations.append(Revocation(signed_token.token_id,
+                                          signed_token.expiration))
+        else:
+            revocations.append(Revocation(get_opaque_token_id(token),
+                                          cached_until))
+    await revoked_tokens.revoke(*revocations)
+    if not tokens:
+        return 0
+    return await AccessTokenTortoise.filter(access_token__in=tokens).delete()
@@ -1,8 +1,31 @@
+import asyncio
+import logging
+import time
+
 from fastapi import FastAPI
+from tortoise import Tortoise
 from tortoise.contrib.fastapi import register_tortoise
 
 from app.config import config
-from app.routers import authentication, cards, collections
+from app.routers import authentication, cards, collections, metrics
+from app.utils.compression import CompressionMiddleware
+from app.utils.database import (ReadRoutingMiddleware, get_reader_connections,
+                                open_connections)
+from app.utils.instrumentation import (InstrumentationMiddleware,
+                                       instrument_db_clients,
+                                       instrument_routes)
+from app.utils.metrics import mark_process_dead
+from app.utils.passwords import get_password_context, hashing_pool
+from app.utils.rate_limit import rate_limiter
+from app.utils.response_cache import response_cache
+from app.utils.search import create_search_index
+from app.utils.startup import (check_migrations, get_applied_migration,
+                               startup_report)
+from app.utils.tasks import metrics_sampler, revocation_sync, token_purger
+from app.utils.tokens import revoked_tokens
+from app.utils.utils import Pagination
+
+logger = logging.getLogger(__name__)
 
 description = """
 This api can power backend for flashcard service.
@@ -24,10 +47,32 @@ app = FastAPI(
 app.include_router(cards.router)
 app.include_router(collections.router)
 app.include_router(authentication.router)
+app.include_router(metrics.router)
+
+
+reader_connections = get_reader_connections(config.database_url,
+                                            config.sqlite_readers)
+
+app.add_middleware(ReadRoutingMiddleware, readers=list(reader_connections))
 
+if config.compression:
+    app.add_middleware(CompressionMiddleware,
+                       minimum_size=config.compression_minimum_size,
+                       thread_size=config.compression_thread_size)
 
-TORTOISE_ORM = {
-    'connections': {'default': config.sqlite_host},
+if config.instrumentation:
+    instrument_db_clients()
+    instrument_routes(app.routes)
+    # added last to wrap other middlewares and report whole request
+    app.add_middleware(InstrumentationMiddleware)
+
+
+TORTOISE_ORM: dict = {
+    'connections': {
+        'default': config.database_url,
+        **reader_connections,
+    },
+    'routers': ['app.utils.database.ReadRouter'],
     'apps': {
         'models': {
             'models': [
@@ -40,9 +85,84 @@ TORTOISE_ORM = {
     },
 }
 
+# started by production startup, kept to be cancelled on shutdown
+warm_up_task: asyncio.Task | None = None
+
+
+async def warm_up() -> None:
+    """Fill caches which first requests of a fresh worker would fill."""
+    start = time.perf_counter()
+    try:
+        await hashing_pool.run(get_password_context)
+        await collections.read_public_collections(Pagination(0, 10))
+    except Exception:
+        logger.exception('warm up failed')
+    else:
+        startup_report.record('warm_up', time.perf_counter() - start)
+        logger.info('warm up took %.1fms',
+                    startup_report.phases['warm_up'] * 1000)
+
+
+async def prepare_schema() -> None:
+    if config.startup_mode == 'production':
+        # schema is managed by migrations, search index included
+        await check_migrations()
+        startup_report.mark('migrations')
+    else:
+        # generated schema lacks columns added to existing tables since,
+        # so databases under migrations have to be upgraded in any mode
+        if await get_applied_migration() is not None:
+            await check_migrations()
+        await Tortoise.generate_schemas()
+        await create_search_index()
+        startup_report.mark('schema')
+
+
+@app.on_event('startup')
+async def begin_startup() -> None:
+    # registered before tortoise to report its initialization apart
+    startup_report.mark('import')
+
+
+@app.on_event('shutdown')
+async def shutdown() -> None:
+    # registered before tortoise to stop using connections before they close
+    if warm_up_task is not None:
+        warm_up_task.cancel()
+    await token_purger.stop()
+    await revocation_sync.stop()
+    await metrics_sampler.stop()
+    await response_cache.close()
+    await rate_limiter.close()
+    mark_process_dead()
+
+
 register_tortoise(
     app,
     config=TORTOISE_ORM,
-    generate_schemas=True,
+    generate_schemas=False,
     add_exception_handlers=True,
 )
+
+
+@app.on_event('startup')
+async def startup() -> None:
+    global warm_up_task
+    startup_report.mark('orm')
+    try:
+        await prepare_schema()
+    except Exception:
+        # shutdown is not run after failed startup and threads of open
+        # connections would keep process alive
+        await Tortoise.close_connections()
+        raise
+    await open_connections(list(reader_connections))
+    startup_report.mark('readers')
+    await revoked_tokens.load()
+    startup_report.mark('revocations')
+    token_purger.start()
+    revocation_sync.start()
+    metrics_sampler.start()
+    startup_report.log()
+    if config.startup_mode == 'production':
+        warm_up_task = asyncio.create_task(warm_up())
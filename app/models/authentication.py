@@ -70,3 +70,13 @@ class AccessTokenTortoise(Model):
 
     class Meta:
         table = 'access_tokens'
+        indexes = (('expiration', ), ('user_id', 'expiration'))
+
+
+class RevokedTokenTortoise(Model):
+    id = fields.IntField(pk=True, generated=True)
+    token_id = fields.CharField(unique=True, max_length=32)
+    expiration = fields.DatetimeField(null=False, index=True)
+
+    class Meta:
+        table = 'revoked_tokens'
@@ -1,4 +1,5 @@
 from datetime import datetime
+from enum import Enum
 
 from pydantic import BaseModel, Field, validator
 from tortoise import fields
@@ -79,6 +80,30 @@ class CardPartialUpdate(BaseModel):
         orm_mode = True
 
 
+class CardBulkResult(BaseModel):
+    """Model for result of creation of particular card in bulk."""
+    index: int
+    id: int | None = None
+    collections: list[int] = []
+    errors: list[dict] | None = None
+
+
+class CardBulkDeleteResult(BaseModel):
+    """Model for result of deletion of cards in bulk."""
+    deleted: int
+
+
+class CardSearchHit(BaseModel):
+    """Model for card found by full-text search."""
+    id: int
+    title: str
+    content: str
+    creation: datetime
+    last_update: datetime
+    rank: float
+    snippet: str
+
+
 class CardTortoise(Model):
     """ORM card model."""
     id = fields.IntField(pk=True, generated=True)
@@ -89,12 +114,14 @@ class CardTortoise(Model):
         related_name='card_owner',
         on_delete=fields.CASCADE
     )
+    owner_id: int
     collections: fields.ReverseRelation['CollectionTortoise']
     creation = fields.DatetimeField(null=False, auto_now_add=True)
     last_update = fields.DatetimeField(null=False, auto_now=True)
 
     class Meta:
         table = 'cards'
+        indexes = (('owner_id', 'id'), )
 
 
 class CollectionDBLong(CollectionBase):
@@ -129,15 +156,50 @@ class CollectionTortoise(Model):
     cards = fields.ManyToManyField(
         'models.CardTortoise',
         related_name='collections',
-        on_delete=fields.SET_NULL
+        through='collections_cards',
+        forward_key='cardtortoise_id',
+        backward_key='collections_id',
+        on_delete=fields.CASCADE
     )
     owner = fields.ForeignKeyField(
         'models.UserTortoise',
         related_name='collection_owner',
         on_delete=fields.CASCADE
     )
+    owner_id: int
     is_private = fields.BooleanField(default=True)
     last_update = fields.DatetimeField(null=False, auto_now=True)
 
     class Meta:
         table = 'collections'
+        indexes = (('owner_id', 'id'), ('is_private', 'id'))
+
+
+class CollectionCardTortoise(Model):
+    """ORM model of through table of collections and cards."""
+    id = fields.IntField(pk=True, generated=True)
+    collection: fields.ForeignKeyRelation[
+        'CollectionTortoise'
+    ] = fields.ForeignKeyField(
+        'models.CollectionTortoise',
+        related_name=False,
+        source_field='collections_id',
+        on_delete=fields.CASCADE
+    )
+    card: fields.ForeignKeyRelation['CardTortoise'] = fields.ForeignKeyField(
+        'models.CardTortoise',
+        related_name=False,
+        source_field='cardtortoise_id',
+        on_delete=fields.CASCADE
+    )
+
+    class Meta:
+        table = 'collections_cards'
+        unique_together = (('collection_id', 'card_id'), )
+        indexes = (('card_id', 'collection_id'), )
+
+
+class ExportFormat(str, Enum):
+    """Formats of collection export."""
+    ndjson = 'ndjson'
+    csv = 'csv'
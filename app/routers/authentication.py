@@ -1,41 +1,64 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import (APIRouter, Depends, HTTPException, Request, Response,
+                     status)
 from fastapi.security import OAuth2PasswordRequestForm
+from tortoise import timezone
 from tortoise.exceptions import DoesNotExist, IntegrityError
 
+from app.config import config
+from app.dependencies import (get_current_user, oauth2_scheme,
+                              revoke_access_tokens)
 from app.models.authentication import (AccessToken, AccessTokenTortoise, User,
                                        UserCreate, UserDB, UserTortoise)
-from app.utils.passwords import get_password_hash, verify_password
+from app.utils.instrumentation import InstrumentedRoute
+from app.utils.passwords import check_password, hash_password
+from app.utils.rate_limit import rate_limiter
+from app.utils.tokens import sign_token
 
 router = APIRouter(
-    tags=['authentication']
+    tags=['authentication'],
+    route_class=InstrumentedRoute
 )
 
 
+def get_client_ip(request: Request) -> str | None:
+    return request.client.host if request.client else None
+
+
 async def authenticate(email: str, password: str) -> UserDB | None:
     """Return user if authenticated, None otherwise."""
     try:
         user = await UserTortoise.get(email=email)
     except DoesNotExist:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await check_password(password, user.hashed_password):
         return None
     return UserDB.from_orm(user)
 
 
 async def create_access_token(user: UserDB) -> AccessToken:
-    """Create access token for authenticated user."""
+    """Create access token, revoke the oldest ones over per user limit."""
     access_token = AccessToken(user_id=user.id)
+    if config.token_mode == 'signed':
+        access_token.access_token = sign_token(user.id,
+                                               access_token.expiration)
     access_token_tortoise = await AccessTokenTortoise.create(
         **access_token.dict()
     )
+    if config.token_limit_per_user > 0:
+        await revoke_access_tokens(*await AccessTokenTortoise.filter(
+            user_id=user.id, expiration__gte=timezone.now()
+        ).order_by('-expiration').offset(
+            config.token_limit_per_user
+        ).values_list('access_token', flat=True))
     return AccessToken.from_orm(access_token_tortoise)
 
 
 @router.post('/register', status_code=status.HTTP_201_CREATED,
              summary='Register user.')
-async def register_user(user: UserCreate) -> User:
-    """Register user with email and password."""
-    hashed_password = get_password_hash(user.password)
+async def register_user(request: Request, user: UserCreate) -> User:
+    """Register user with email and password, 429 if tried too often."""
+    await rate_limiter.check(get_client_ip(request), user.email)
+    hashed_password = await hash_password(user.password)
 
     try:
         user_tortoise = await UserTortoise.create(
@@ -52,11 +75,16 @@ async def register_user(user: UserCreate) -> User:
 
 
 @router.post('/token', summary='Create token')
-async def create_token(form_data: OAuth2PasswordRequestForm =
+async def create_token(request: Request,
+                       form_data: OAuth2PasswordRequestForm =
                        Depends(OAuth2PasswordRequestForm)):
-    """Create token if user authenticated, 401 otherwise."""
+    """Create token if user authenticated, 401 otherwise.
+
+    Answers 429 before checking password if tried too often.
+    """
     email = form_data.username
     password = form_data.password
+    await rate_limiter.check(get_client_ip(request), email)
     user = await authenticate(email, password)
 
     if not user:
@@ -66,3 +94,12 @@ async def create_token(form_data: OAuth2PasswordRequestForm =
 
     return {'access_token': token.access_token,
             'token_type': 'bearer'}
+
+
+@router.post('/logout', status_code=status.HTTP_204_NO_CONTENT,
+             summary='Revoke token')
+async def logout(token: str = Depends(oauth2_scheme),
+                 user: UserTortoise = Depends(get_current_user)):
+    """Revoke access token used for the request."""
+    await revoke_access_tokens(token)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,11 +1,33 @@
-from fastapi import APIRouter, Depends, Response, status
+from itertools import count
+from operator import itemgetter
+
+from fastapi import APIRouter, Depends, Query, Request, Response, status
 from fastapi.exceptions import HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import ValidationError
+from tortoise import timezone
+from tortoise.expressions import Subquery
 
+from app.config import config
 from app.dependencies import get_current_user
 from app.models.authentication import UserTortoise
-from app.models.models import (CardCreate, CardDB, CardPartialUpdate,
-                               CardTortoise, CollectionTortoise)
-from app.utils.utils import pagination
+from app.models.models import (CardBulkDeleteResult, CardBulkResult,
+                               CardCreate, CardDB, CardPartialUpdate,
+                               CardSearchHit, CardTortoise,
+                               CollectionCardTortoise, CollectionTortoise)
+from app.utils.conditional import (PRIVATE_CACHE_CONTROL, get_card_version,
+                                   is_not_modified, not_modified,
+                                   set_validators)
+from app.utils.database import in_write_transaction
+from app.utils.instrumentation import InstrumentedRoute
+from app.utils.loaders import load_card_rows, load_cards
+from app.utils.memberships import (add_card_collections, set_card_collections,
+                                   touch_collections)
+from app.utils.response_cache import get_cards_collection_ids, response_cache
+from app.utils.search import search_cards
+from app.utils.serialization import FastJSONResponse
+from app.utils.utils import (Pagination, iter_json_items, paginate, pagination,
+                             set_next_cursor)
 
 
 async def get_card_or_404(id: int) -> CardTortoise:
@@ -21,30 +43,118 @@ async def check_card_owner(user: UserTortoise = Depends(get_current_user),
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
 
 
+async def save_cards_chunk(cards: list[tuple[int, CardCreate]],
+                           user: UserTortoise) -> list[dict]:
+    """Insert cards with their collections in a single transaction.
+
+    Rows are inserted with plain executemany, as building ORM instances
+    takes longer than the inserts themselves for large imports.
+    """
+    collection_ids = {col.id for _, card in cards
+                      for col in card.collections or []}
+    now = timezone.now().isoformat(' ')
+    async with in_write_transaction() as connection:
+        owned_ids = set(await CollectionTortoise.filter(
+            id__in=collection_ids, owner_id=user.id
+        ).using_db(connection).values_list('id', flat=True)) \
+            if collection_ids else set()
+
+        await connection.execute_many(
+            'INSERT INTO "cards" '
+            '("title", "content", "creation", "last_update", "owner_id") '
+            'VALUES (?, ?, ?, ?, ?)',
+            [[card.title, card.content, now, now, user.id]
+             for _, card in cards]
+        )
+        # Rows inserted within one write transaction get consecutive ids
+        last_id = (await connection.execute_query_dict(
+            'SELECT last_insert_rowid() AS "id"'
+        ))[0]['id']
+
+        results = []
+        links = []
+        for id, (index, card) in enumerate(cards,
+                                           start=last_id - len(cards) + 1):
+            card_collection_ids = list(dict.fromkeys(
+                col.id for col in card.collections or []
+                if col.id in owned_ids
+            ))
+            links += [[collection_id, id]
+                      for collection_id in card_collection_ids]
+            results.append({'index': index, 'id': id,
+                            'collections': card_collection_ids,
+                            'errors': None})
+        if links:
+            await connection.execute_many(
+                'INSERT INTO "collections_cards" '
+                '("collections_id", "cardtortoise_id") VALUES (?, ?)',
+                links
+            )
+            await touch_collections(
+                connection, (collection_id for collection_id, _ in links)
+            )
+    await response_cache.invalidate_collections(
+        collection_id for collection_id, _ in links
+    )
+    return results
+
+
 router = APIRouter(
     prefix='/cards',
-    tags=['cards']
+    tags=['cards'],
+    route_class=InstrumentedRoute
 )
 
 
 @router.get('/', summary='Get all your cards.')
-async def read_cards(pagination: tuple[int, int] = Depends(pagination),
+async def read_cards(response: Response,
+                     pagination: Pagination = Depends(pagination),
                      user: UserTortoise = Depends(get_current_user)) \
-                     -> list[CardDB]:
+                     -> list[CardDB] | Response:
     """Get all cards of user."""
-    skip, limit = pagination
-    cards = await CardTortoise.filter(
-        owner_id=user.id
-    ).offset(skip).limit(limit)
+    queryset = paginate(CardTortoise.filter(owner_id=user.id), pagination)
+    if config.fast_serialization:
+        rows = await load_card_rows(queryset)
+        fast_response = FastJSONResponse(rows)
+        set_next_cursor(fast_response, rows, pagination)
+        return fast_response
+    cards = await load_cards(queryset)
+    set_next_cursor(response, cards, pagination)
+    return cards
+
 
-    for card in cards:
-        await card.fetch_related('collections')
-    return [CardDB.from_orm(card) for card in cards]
+@router.get('/search', response_model=list[CardSearchHit],
+            summary='Search your cards.')
+async def search(response: Response,
+                 q: str = Query(..., min_length=1,
+                                description='Words to look for in title '
+                                            'and content, the last one '
+                                            'may be incomplete.'),
+                 include_public: bool = Query(
+                     False, description='Search cards of public collections '
+                                        'as well as your own ones.'
+                 ),
+                 pagination: Pagination = Depends(pagination),
+                 user: UserTortoise = Depends(get_current_user)) \
+                 -> list[CardSearchHit]:
+    """Get cards matching query, most relevant first."""
+    hits = await search_cards(q, user.id, include_public, pagination)
+    set_next_cursor(response, hits, pagination, 'rank')
+    return hits
 
 
 @router.get('/{id}', summary='Get particular card.')
-async def read_card(card: CardTortoise = Depends(check_card_owner)) -> CardDB:
-    """Get card with particular id."""
+async def read_card(request: Request, response: Response,
+                    card: CardTortoise = Depends(check_card_owner)) \
+                    -> CardDB | Response:
+    """Get card with particular id.
+
+    Answers 304 if ETag or modification date given in request is current.
+    """
+    version = await get_card_version(card)
+    if is_not_modified(request, version):
+        return not_modified(version, PRIVATE_CACHE_CONTROL)
+    set_validators(response, version, PRIVATE_CACHE_CONTROL)
     await card.fetch_related('collections')
     return CardDB.from_orm(card)
 
@@ -54,22 +164,64 @@ async def read_card(card: CardTortoise = Depends(check_card_owner)) -> CardDB:
 async def save_card(card: CardCreate,
                     user: UserTortoise = Depends(get_current_user)) -> CardDB:
     """Create card."""
-    card_tortoise = await CardTortoise.create(
-        owner=user,
-        **card.dict(exclude={'collections', })
+    async with in_write_transaction() as connection:
+        card_tortoise = await CardTortoise.create(
+            owner=user,
+            using_db=connection,
+            **card.dict(exclude={'collections', })
+        )
+        await add_card_collections(connection, card_tortoise.id, user.id,
+                                   [col.id for col in card.collections or []])
+        await card_tortoise.fetch_related('collections', using_db=connection)
+        await touch_collections(
+            connection, (col.id for col in card_tortoise.collections)
+        )
+
+    await response_cache.invalidate_collections(
+        col.id for col in card_tortoise.collections
     )
+    return CardDB.from_orm(card_tortoise)
 
-    if card.collections:
-        collections: filter[CollectionTortoise] = filter(
-            None,
-            [await CollectionTortoise.get_or_none(id=col.id, owner_id=user.id)
-             for col in card.collections]
-        )
 
-        await card_tortoise.collections.add(*collections)
+@router.post('/bulk', response_model=list[CardBulkResult],
+             summary='Create cards in bulk.',
+             openapi_extra={'requestBody': {'required': True, 'content': {
+                 'application/json': {'schema': {
+                     'type': 'array',
+                     'items': {'$ref': '#/components/schemas/CardCreate'}
+                 }},
+                 'application/x-ndjson': {'schema': {
+                     '$ref': '#/components/schemas/CardCreate'
+                 }},
+             }}})
+async def save_cards(request: Request,
+                     user: UserTortoise = Depends(get_current_user)) \
+                     -> JSONResponse:
+    """Create cards from JSON array or NDJSON body.
 
-    await card_tortoise.fetch_related('collections')
-    return CardDB.from_orm(card_tortoise)
+    Cards are inserted in chunks, each in its own transaction. Result
+    of every item is reported by its index, invalid items are skipped.
+    Results are returned as is, without validation against response model.
+    """
+    results: list[dict] = []
+    chunk: list[tuple[int, CardCreate]] = []
+    indexes = count()
+    async for item in iter_json_items(request):
+        index = next(indexes)
+        try:
+            card = CardCreate.parse_raw(item) if isinstance(item, bytes) \
+                else CardCreate.parse_obj(item)
+        except ValidationError as exc:
+            results.append({'index': index, 'id': None, 'collections': [],
+                            'errors': exc.errors()})
+            continue
+        chunk.append((index, card))
+        if len(chunk) >= config.bulk_chunk_size:
+            results += await save_cards_chunk(chunk, user)
+            chunk = []
+    if chunk:
+        results += await save_cards_chunk(chunk, user)
+    return JSONResponse(sorted(results, key=itemgetter('index')))
 
 
 @router.put('/{id}', summary='Update card.')
@@ -77,37 +229,72 @@ async def update_card(
         card_update: CardPartialUpdate,
         card: CardTortoise = Depends(check_card_owner)) -> CardDB:
     """Update existing card."""
+    collection_ids = await get_cards_collection_ids(
+        CardTortoise.filter(id=card.id)
+    )
     card.update_from_dict(card_update.dict(exclude={'collections', },
                                            exclude_unset=True))
-    await card.save()
-
-    if card_update.collections:
-        await card.fetch_related('collections')
-        card_old_collections = set(card.collections)
-        card_new_collections = set(filter(  # type: ignore
-            None,
-            [
-                await CollectionTortoise.get_or_none(id=col.id)
-                for col in card_update.collections
-            ]
-        ))
-        collections_to_add = card_new_collections - card_old_collections
-        collections_to_remove = card_old_collections - card_new_collections
-        if collections_to_add:
-            await card.collections.add(*collections_to_add)
-        if collections_to_remove:
-            await card.collections.remove(*collections_to_remove)
+    async with in_write_transaction() as connection:
+        await card.save(using_db=connection)
+        if card_update.collections:
+            await set_card_collections(
+                connection, card.id, card.owner_id,
+                [col.id for col in card_update.collections]
+            )
+        await card.fetch_related('collections', using_db=connection)
+        await touch_collections(connection, set(collection_ids) ^ {
+            col.id for col in card.collections
+        })
 
-    await card.fetch_related('collections')
+    await response_cache.invalidate_collections(
+        collection_ids + [col.id for col in card.collections]
+    )
     return CardDB.from_orm(card)
 
 
 @router.delete('/{id}', status_code=status.HTTP_204_NO_CONTENT,
                summary='Delete card.')
 async def delete_card(card: CardTortoise = Depends(check_card_owner)):
-    """Delete card."""
-    await card.fetch_related('collections')
-    for collection in card.collections:
-        await card.collections.remove(collection)
-    await card.delete()
+    """Delete card, its collection links are removed by cascade."""
+    collection_ids = await get_cards_collection_ids(
+        CardTortoise.filter(id=card.id)
+    )
+    async with in_write_transaction() as connection:
+        await card.delete(using_db=connection)
+        await touch_collections(connection, collection_ids)
+    await response_cache.invalidate_collections(collection_ids)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.delete('/', response_model=CardBulkDeleteResult,
+               summary='Delete cards in bulk.')
+async def delete_cards(
+    collection_id: int | None = Query(
+        None, description='Delete own cards of this collection.'
+    ),
+    id: list[int] | None = Query(None, description='Delete own cards by id.'),
+    user: UserTortoise = Depends(get_current_user)
+) -> CardBulkDeleteResult:
+    """Delete cards of user chosen by collection and/or ids."""
+    if collection_id is None and not id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail='Either collection_id or id is required')
+    cards = CardTortoise.filter(owner_id=user.id)
+    if collection_id is not None:
+        cards = cards.filter(id__in=Subquery(
+            CollectionCardTortoise.filter(
+                collection_id=collection_id
+            ).values('card_id')
+        ))
+    if id:
+        cards = cards.filter(id__in=id)
+    # sqlite reports changes made by cascades and triggers too
+    async with in_write_transaction() as connection:
+        deleted = await cards.using_db(connection).count()
+        collection_ids = await get_cards_collection_ids(
+            cards.using_db(connection)
+        )
+        await cards.using_db(connection).delete()
+        await touch_collections(connection, collection_ids)
+    await response_cache.invalidate_collections(collection_ids)
+    return CardBulkDeleteResult(deleted=deleted)
@@ -1,13 +1,31 @@
-from fastapi import APIRouter, Depends, Response, status
+from fastapi import APIRouter, Depends, Request, Response, status
+from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 
+from app.config import config
 from app.dependencies import get_current_user
 from app.models.authentication import UserTortoise
 from app.models.models import (CollectionCreate, CollectionDBLong,
                                CollectionDBShort, CollectionPartialUpdate,
-                               CollectionPublicLong, CollectionPublicShort,
-                               CollectionTortoise)
-from app.utils.utils import pagination
+                               CollectionPublicShort, CollectionTortoise,
+                               ExportFormat)
+from app.utils.conditional import (PRIVATE_CACHE_CONTROL,
+                                   get_collection_version, get_version,
+                                   is_not_modified, not_modified,
+                                   set_validators)
+from app.utils.database import in_write_transaction
+from app.utils.export import export_collection
+from app.utils.instrumentation import InstrumentedRoute
+from app.utils.loaders import (load_collection, load_collection_row,
+                               load_public_collections)
+from app.utils.memberships import touch_collection_cards
+from app.utils.response_cache import (PUBLIC_COLLECTIONS_SCOPE, CachedResponse,
+                                      collection_scope, get_cached_headers,
+                                      get_related_collection_ids,
+                                      response_cache)
+from app.utils.serialization import FastJSONResponse
+from app.utils.utils import Pagination, paginate, pagination, set_next_cursor
 
 
 async def get_collection_or_404(id: int) -> CollectionTortoise:
@@ -25,67 +43,134 @@ async def check_collection_owner(
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
 
 
+async def get_public_collection_or_403(
+    collection: CollectionTortoise = Depends(get_collection_or_404)
+) -> CollectionTortoise:
+    if collection.is_private:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+    return collection
+
+
+async def render_collection(collection: CollectionTortoise) -> JSONResponse:
+    """Return response with collection and all its cards.
+
+    Rows are encoded directly if fast serialization is enabled.
+    """
+    if config.fast_serialization:
+        return FastJSONResponse(await load_collection_row(collection))
+    return JSONResponse(jsonable_encoder(await load_collection(collection)))
+
+
 router = APIRouter(
     prefix='/collections',
-    tags=['collections']
+    tags=['collections'],
+    route_class=InstrumentedRoute
 )
 
 
-@router.get('/public', summary='Get publicly available collections.')
+@router.get('/public', response_model=list[CollectionPublicShort],
+            summary='Get publicly available collections.')
 async def read_public_collections(
-    pagination: tuple[int, int] = Depends(pagination)
-) -> list[CollectionPublicShort]:
-    """Get list of public collections."""
-    skip, limit = pagination
-    collections = await CollectionTortoise.filter(
-        is_private=False
-    ).offset(skip).limit(limit)
-
-    for col in collections:
-        await col.fetch_related('owner')
-
-    return [CollectionPublicShort.from_orm(col) for col in collections]
+    pagination: Pagination = Depends(pagination)
+) -> Response:
+    """Get list of public collections, pages are served from cache."""
+    async def build() -> CachedResponse:
+        collections = await load_public_collections(
+            paginate(CollectionTortoise.filter(is_private=False), pagination)
+        )
+        response = JSONResponse(jsonable_encoder(collections))
+        set_next_cursor(response, collections, pagination)
+        return CachedResponse(body=response.body,
+                              headers=get_cached_headers(response))
+
+    key = ':'.join(map(str, (PUBLIC_COLLECTIONS_SCOPE, *pagination)))
+    cached = await response_cache.get_or_build(
+        key, PUBLIC_COLLECTIONS_SCOPE, build
+    )
+    return Response(cached.body, media_type='application/json',
+                    headers=cached.headers)
 
 
 @router.get('/private', summary='Get collections that you own.')
 async def read_private_collections(
-    pagination: tuple[int, int] = Depends(pagination),
+    response: Response,
+    pagination: Pagination = Depends(pagination),
     user: UserTortoise = Depends(get_current_user)
 ) -> list[CollectionDBShort]:
     """Get list of collections which belong to you."""
-    skip, limit = pagination
-    collections = await CollectionTortoise.filter(
-        owner_id=user.id
-    ).offset(skip).limit(limit)
-
+    collections = await paginate(
+        CollectionTortoise.filter(owner_id=user.id), pagination
+    )
+    set_next_cursor(response, collections, pagination)
     return [CollectionDBShort.from_orm(col) for col in collections]
 
 
 @router.get('/public/{id}', response_model=CollectionDBLong,
             summary='Get particular public collection.')
-async def read_public_collection(
-    collection: CollectionTortoise =
-    Depends(get_collection_or_404)
-) -> CollectionPublicLong:
-    """Get public collection with all its cards."""
-    await collection.fetch_related('cards')
-    for card in collection.cards:
-        await card.fetch_related('collections')
-    await collection.fetch_related('owner')
-    return CollectionPublicLong.from_orm(collection)
+async def read_public_collection(id: int, request: Request) -> Response:
+    """Get public collection with all its cards, served from cache.
+
+    Answers 304 if ETag or modification date given in request is current.
+    """
+    async def build() -> CachedResponse:
+        collection = await get_public_collection_or_403(
+            await get_collection_or_404(id)
+        )
+        version = await get_collection_version(collection, 'public')
+        response = await render_collection(collection)
+        set_validators(response, version)
+        return CachedResponse(body=response.body,
+                              headers=get_cached_headers(response))
+
+    cached = await response_cache.get_or_build(
+        collection_scope(id), collection_scope(id), build
+    )
+    version = get_version(cached.headers)
+    if is_not_modified(request, version):
+        return not_modified(version)
+    return Response(cached.body, media_type='application/json',
+                    headers=cached.headers)
 
 
 @router.get('/private/{id}', response_model=CollectionDBLong,
             summary='Get particular collection that you own.')
 async def read_private_collection(
+    request: Request,
     collection: CollectionTortoise =
     Depends(check_collection_owner)
-) -> CollectionDBLong:
-    """Get private collection with all its cards."""
-    await collection.fetch_related('cards')
-    for card in collection.cards:
-        await card.fetch_related('collections')
-    return CollectionDBLong.from_orm(collection)
+) -> Response:
+    """Get private collection with all its cards.
+
+    Answers 304 if ETag or modification date given in request is current.
+    """
+    version = await get_collection_version(collection, 'private')
+    if is_not_modified(request, version):
+        return not_modified(version, PRIVATE_CACHE_CONTROL)
+    response = await render_collection(collection)
+    set_validators(response, version, PRIVATE_CACHE_CONTROL)
+    return response
+
+
+@router.get('/public/{id}/export', response_class=StreamingResponse,
+            summary='Export public collection.')
+async def export_public_collection(
+    format: ExportFormat = ExportFormat.ndjson,
+    collection: CollectionTortoise =
+    Depends(get_public_collection_or_403)
+) -> StreamingResponse:
+    """Stream all cards of public collection as NDJSON or CSV."""
+    return export_collection(collection, format)
+
+
+@router.get('/private/{id}/export', response_class=StreamingResponse,
+            summary='Export collection that you own.')
+async def export_private_collection(
+    format: ExportFormat = ExportFormat.ndjson,
+    collection: CollectionTortoise =
+    Depends(check_collection_owner)
+) -> StreamingResponse:
+    """Stream all cards of your collection as NDJSON or CSV."""
+    return export_collection(collection, format)
 
 
 @router.post('/', status_code=status.HTTP_201_CREATED,
@@ -99,6 +184,8 @@ async def save_collection(
         owner=user,
         **collection.dict()
     )
+    if not collection_tortoise.is_private:
+        await response_cache.invalidate(PUBLIC_COLLECTIONS_SCOPE)
     return CollectionDBShort.from_orm(collection_tortoise)
 
 
@@ -110,6 +197,9 @@ async def update_collection(
     """Update existing collection."""
     collection.update_from_dict(collection_update.dict(exclude_unset=True))
     await collection.save()
+    await response_cache.invalidate_collections(
+        await get_related_collection_ids(collection.id), listing=True
+    )
 
     return CollectionDBShort.from_orm(collection)
 
@@ -120,9 +210,11 @@ async def delete_collection(
     collection: CollectionTortoise =
     Depends(check_collection_owner)
 ):
-    """Delete collection."""
-    await collection.fetch_related('cards')
-    for card in collection.cards:
-        await collection.cards.remove(card)
-    await collection.delete()
+    """Delete collection, its card links are removed by cascade."""
+    related_ids = await get_related_collection_ids(collection.id)
+    async with in_write_transaction() as connection:
+        # cards list their collections, so they change as well
+        await touch_collection_cards(connection, collection.id)
+        await collection.delete(using_db=connection)
+    await response_cache.invalidate_collections(related_ids, listing=True)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
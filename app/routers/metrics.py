@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Response
+
+from app.utils.instrumentation import InstrumentedRoute
+from app.utils.metrics import render_metrics
+from app.utils.tasks import metrics_sampler
+
+router = APIRouter(
+    tags=['metrics'],
+    route_class=InstrumentedRoute
+)
+
+
+@router.get('/metrics', include_in_schema=False)
+async def read_metrics() -> Response:
+    """Get metrics of all workers in Prometheus text format."""
+    # state of this worker is sampled right away, others on their interval
+    await metrics_sampler.step()
+    content, media_type = render_metrics()
+    return Response(content, media_type=media_type)
@@ -0,0 +1,173 @@
+import asyncio
+import zlib
+from typing import Protocol
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import config
+from app.utils.metrics import COMPRESSION_BYTES
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None  # type: ignore
+
+# Media types worth compressing, others such as images are sent as is
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+# Supported encodings in order of preference
+ENCODINGS = ('zstd', 'gzip') if zstandard is not None else ('gzip',)
+
+
+class Compressor(Protocol):
+    def compress(self, data: bytes) -> bytes:
+        ...
+
+    def flush(self) -> bytes:
+        ...
+
+
+def choose_encoding(accept_encoding: str,
+                    encodings: tuple[str, ...] = ENCODINGS) -> str | None:
+    """Return encoding of Accept-Encoding header to compress with.
+
+    Quality values of client win, preference of server breaks ties.
+    """
+    qualities: dict[str, float] = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.partition(';')
+        quality = 1.0
+        params = params.strip().lower()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                continue
+        qualities[coding.strip().lower()] = quality
+    default = qualities.get('*', 0)
+    # max returns the first of equal encodings
+    encoding = max(encodings, key=lambda name: qualities.get(name, default))
+    return encoding if qualities.get(encoding, default) > 0 else None
+
+
+def get_compressor(encoding: str) -> Compressor:
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(
+            level=config.compression_zstd_level
+        ).compressobj()
+    # wbits over 16 write gzip header and trailer instead of zlib ones
+    return zlib.compressobj(config.compression_gzip_level, zlib.DEFLATED,
+                            16 + zlib.MAX_WBITS)
+
+
+class CompressionMiddleware:
+    """Compress bodies of responses with encoding accepted by client.
+
+    Bodies under `minimum_size`, responses without body such as 304 and
+    already encoded ones are sent as is. Streaming responses are compressed
+    chunk by chunk whatever their size. Chunks of `thread_size` and more are
+    compressed in a thread, zlib and zstd release GIL meanwhile.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int,
+                 thread_size: int) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.thread_size = thread_size
+
+    async def __call__(self, scope: Scope, receive: Receive,
+                       send: Send) -> None:
+        if scope['type'] == 'http':
+            encoding = choose_encoding(
+                Headers(scope=scope).get('accept-encoding', '')
+            )
+            if encoding is not None:
+                responder = CompressionResponder(
+                    send, encoding, self.minimum_size, self.thread_size
+                )
+                await self.app(scope, receive, responder.send)
+                return
+        await self.app(scope, receive, send)
+
+
+class CompressionResponder:
+    """Compress body of one response while it is sent."""
+
+    def __init__(self, send: Send, encoding: str, minimum_size: int,
+                 thread_size: float) -> None:
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.thread_size = thread_size
+        self.start: Message | None = None
+        self.compressor: Compressor | None = None
+
+    def should_compress(self, start: Message, headers: MutableHeaders,
+                        size: int, more_body: bool) -> bool:
+        media_type = headers.get('content-type', '').split(';')[0]
+        return (start['status'] not in (204, 304)
+                and 'content-encoding' not in headers
+                and media_type.startswith(COMPRESSIBLE_TYPES)
+                and (more_body or size >= self.minimum_size))
+
+    async def send(self, message: Message) -> None:
+        if message['type'] == 'http.response.start':
+            # held back until the first body tells whether to compress
+            self.start = message
+            return
+        if message['type'] != 'http.response.body':
+            await self._send(message)
+            return
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+
+        if self.start is not None:
+            start, self.start = self.start, None
+            headers = MutableHeaders(raw=start['headers'])
+            if not self.should_compress(start, headers, len(body),
+                                        more_body):
+                await self._send(start)
+                await self._send(message)
+                return
+            self.compressor = get_compressor(self.encoding)
+            body = await self.compress(body, finish=not more_body)
+            headers['Content-Encoding'] = self.encoding
+            headers.add_vary_header('Accept-Encoding')
+            if more_body:
+                del headers['Content-Length']
+            else:
+                headers['Content-Length'] = str(len(body))
+            etag = headers.get('etag')
+            if etag is not None and not etag.startswith('W/'):
+                # encoded bytes differ from those the strong etag stands for
+                headers['ETag'] = f'W/{etag}'
+            await self._send(start)
+        elif self.compressor is None:
+            await self._send(message)
+            return
+        else:
+            body = await self.compress(body, finish=not more_body)
+
+        if body or not more_body:
+            await self._send({**message, 'body': body})
+
+    async def compress(self, body: bytes, finish: bool) -> bytes:
+        """Compress chunk of body, in a thread if it is large."""
+        if len(body) >= self.thread_size:
+            compressed = await asyncio.get_running_loop().run_in_executor(
+                None, self._compress, body, finish
+            )
+        else:
+            compressed = self._compress(body, finish)
+        COMPRESSION_BYTES.labels(self.encoding, 'original').inc(len(body))
+        COMPRESSION_BYTES.labels(self.encoding,
+                                 'compressed').inc(len(compressed))
+        return compressed
+
+    def _compress(self, body: bytes, finish: bool) -> bytes:
+        assert self.compressor is not None
+        compressed = self.compressor.compress(body)
+        if finish:
+            compressed += self.compressor.flush()
+        return compressed
@@ -0,0 +1,113 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Mapping, NamedTuple
+
+from fastapi import Request, Response, status
+
+from app.models.models import CardTortoise, CollectionTortoise
+from app.utils.database import get_read_connection
+
+# Links are counted over every collection of the cards, as each card lists
+# all its collections. Ids of links only grow, so count and greatest id
+# change whenever a link is added or removed.
+COLLECTION_VERSION_QUERY = (
+    'SELECT COUNT(*) "links", MAX("o"."id") "last_link", '
+    'MAX("c"."last_update") "cards_update", '
+    'MAX("oc"."last_update") "collections_update" '
+    'FROM "collections_cards" "l" '
+    'JOIN "collections_cards" "o" '
+    'ON "o"."cardtortoise_id" = "l"."cardtortoise_id" '
+    'JOIN "cards" "c" ON "c"."id" = "l"."cardtortoise_id" '
+    'JOIN "collections" "oc" ON "oc"."id" = "o"."collections_id" '
+    'WHERE "l"."collections_id" = ?'
+)
+CARD_VERSION_QUERY = (
+    'SELECT COUNT(*) "links", MAX("l"."id") "last_link", '
+    'MAX("c"."last_update") "collections_update" '
+    'FROM "collections_cards" "l" '
+    'JOIN "collections" "c" ON "c"."id" = "l"."collections_id" '
+    'WHERE "l"."cardtortoise_id" = ?'
+)
+
+PRIVATE_CACHE_CONTROL = 'private, no-cache'
+
+
+class Version(NamedTuple):
+    etag: str
+    last_modified: datetime
+
+
+def make_version(kind: str, last_update: datetime,
+                 aggregates: dict) -> Version:
+    """Return version of representation from its aggregated state."""
+    state = ':'.join(map(str, (kind, last_update.isoformat(),
+                               *aggregates.values())))
+    etag = hashlib.blake2b(state.encode(), digest_size=16).hexdigest()
+    updates = [last_update] + [
+        datetime.fromisoformat(value) for key, value in aggregates.items()
+        if key.endswith('_update') and value is not None
+    ]
+    return Version(etag=f'"{etag}"', last_modified=max(updates))
+
+
+async def get_collection_version(collection: CollectionTortoise,
+                                 kind: str) -> Version:
+    """Return version of collection with its cards in one query."""
+    rows = await get_read_connection().execute_query_dict(
+        COLLECTION_VERSION_QUERY, [collection.id]
+    )
+    return make_version(kind, collection.last_update, rows[0])
+
+
+async def get_card_version(card: CardTortoise) -> Version:
+    """Return version of card with its collections in one query."""
+    rows = await get_read_connection().execute_query_dict(
+        CARD_VERSION_QUERY, [card.id]
+    )
+    return make_version('card', card.last_update, rows[0])
+
+
+def get_version(headers: Mapping[str, str]) -> Version:
+    """Return version from validators of stored response."""
+    return Version(etag=headers['etag'],
+                   last_modified=parsedate_to_datetime(
+                       headers['last-modified']
+                   ))
+
+
+def is_not_modified(request: Request, version: Version) -> bool:
+    """Check request preconditions, If-None-Match wins over dates."""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        etags = {etag.strip().removeprefix('W/')
+                 for etag in if_none_match.split(',')}
+        return '*' in etags or version.etag in etags
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return version.last_modified.replace(microsecond=0) <= since
+
+
+def set_validators(response: Response, version: Version,
+                   cache_control: str = 'no-cache') -> None:
+    """Add validators of version to response."""
+    response.headers['ETag'] = version.etag
+    response.headers['Last-Modified'] = format_datetime(
+        version.last_modified.astimezone(timezone.utc), usegmt=True
+    )
+    response.headers['Cache-Control'] = cache_control
+
+
+def not_modified(version: Version,
+                 cache_control: str = 'no-cache') -> Response:
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    set_validators(response, version, cache_control)
+    return response
@@ -0,0 +1,130 @@
+import sqlite3
+from contextvars import ContextVar
+from itertools import cycle
+from typing import Any, Iterable, cast
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import aiosqlite
+from starlette.types import ASGIApp, Receive, Scope, Send
+from tortoise import BaseDBAsyncClient, connections
+from tortoise.backends.base.client import TransactionContext
+from tortoise.backends.base.config_generator import expand_db_url
+from tortoise.backends.sqlite.client import SqliteClient, TransactionWrapper
+from tortoise.exceptions import TransactionManagementError
+
+READ_METHODS = frozenset({'GET', 'HEAD'})
+# Shared stores of workers hold disposable data, durability is not needed.
+SHARED_STORE_PRAGMAS = ('busy_timeout=5000', 'journal_mode=WAL',
+                        'synchronous=OFF')
+
+read_connection: ContextVar[str | None] = ContextVar('read_connection',
+                                                     default=None)
+
+
+def get_reader_connections(db_url: str, count: int) -> dict[str, str]:
+    """Return urls of read-only connections to the database file.
+
+    In-memory databases are private to a connection, so they get no readers.
+    """
+    if expand_db_url(db_url)['credentials']['file_path'] == ':memory:':
+        return {}
+    url = urlsplit(db_url)
+    query = urlencode({**dict(parse_qsl(url.query)), 'query_only': 'ON'})
+    reader_url = urlunsplit(url._replace(query=query))
+    return {f'reader_{i}': reader_url for i in range(count)}
+
+
+async def open_connections(names: list[str]) -> None:
+    """Connect given clients up front.
+
+    Tortoise connects lazily and concurrent first queries could use a client
+    whose connection is not yet established.
+    """
+    for name in names:
+        await connections.get(name).create_connection(with_db=True)
+
+
+async def connect_shared_store(path: str,
+                               schema: Iterable[str]) -> aiosqlite.Connection:
+    """Open database file shared by workers and create its tables."""
+    connection = await aiosqlite.connect(path, isolation_level=None)
+    for pragma in SHARED_STORE_PRAGMAS:
+        await connection.execute(f'PRAGMA {pragma}')
+    for statement in schema:
+        await connection.execute(statement)
+    return connection
+
+
+class ImmediateTransactionWrapper(TransactionWrapper):
+    """Transaction that takes write lock of database when it begins.
+
+    Deferred transaction which reads first fails at its first write when
+    another connection has written meanwhile, as busy timeout cannot help
+    it. Immediate one waits for the lock up to busy timeout instead.
+    """
+
+    async def start(self) -> None:
+        try:
+            await self._connection.commit()
+            await self._connection.execute('BEGIN IMMEDIATE')
+        except sqlite3.OperationalError as exc:
+            raise TransactionManagementError(exc)
+
+
+def in_write_transaction(
+    connection_name: str = 'default'
+) -> TransactionContext:
+    """Return `in_transaction` context which begins as a writer."""
+    client = connections.get(connection_name)
+    if type(client) is SqliteClient:
+        return TransactionContext(ImmediateTransactionWrapper(client))
+    # already in transaction
+    return client._in_transaction()
+
+
+def get_read_connection() -> BaseDBAsyncClient:
+    """Return connection chosen for reads of current request."""
+    return connections.get(read_connection.get() or 'default')
+
+
+class ReadRouter:
+    """Send reads of read-only requests to their reader connection."""
+
+    def db_for_read(self, model: Any) -> str | None:
+        return read_connection.get()
+
+    def db_for_write(self, model: Any) -> None:
+        return None
+
+
+class ReadRoutingMiddleware:
+    """Pin every GET and HEAD request to one of reader connections.
+
+    Idle readers are preferred, otherwise they are taken in turn. Other
+    requests keep all their queries on the default writer connection.
+    """
+
+    def __init__(self, app: ASGIApp, readers: list[str]) -> None:
+        self.app = app
+        self.readers = readers
+        self._order = cycle(readers)
+
+    def choose_reader(self) -> str:
+        for _ in self.readers:
+            name = next(self._order)
+            client = cast(SqliteClient, connections.get(name))
+            if not client._lock.locked():
+                return name
+        return next(self._order)
+
+    async def __call__(self, scope: Scope, receive: Receive,
+                       send: Send) -> None:
+        if (not self.readers or scope['type'] != 'http'
+                or scope['method'] not in READ_METHODS):
+            await self.app(scope, receive, send)
+            return
+        token = read_connection.set(self.choose_reader())
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            read_connection.reset(token)
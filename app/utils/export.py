@@ -0,0 +1,58 @@
+import csv
+import io
+import json
+from typing import AsyncIterator
+
+from fastapi.responses import StreamingResponse
+
+from app.config import config
+from app.models.models import CollectionTortoise, ExportFormat
+from app.utils.loaders import iter_collection_cards
+from app.utils.serialization import json_default
+
+MEDIA_TYPES = {
+    ExportFormat.ndjson: 'application/x-ndjson',
+    ExportFormat.csv: 'text/csv',
+}
+CSV_FIELDS = ('id', 'title', 'content', 'creation', 'last_update',
+              'collections')
+
+
+async def iter_ndjson(
+    chunks: AsyncIterator[list[dict]]
+) -> AsyncIterator[bytes]:
+    """Yield cards as JSON lines, a chunk at a time."""
+    async for cards in chunks:
+        yield ''.join(json.dumps(card, default=json_default) + '\n'
+                      for card in cards).encode()
+
+
+async def iter_csv(chunks: AsyncIterator[list[dict]]) -> AsyncIterator[bytes]:
+    """Yield cards as CSV rows with collections as space separated ids."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_FIELDS)
+    async for cards in chunks:
+        writer.writerows(
+            (card['id'], card['title'], card['content'],
+             card['creation'].isoformat(), card['last_update'].isoformat(),
+             ' '.join(str(col['id']) for col in card['collections']))
+            for card in cards
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def export_collection(collection: CollectionTortoise,
+                      format: ExportFormat) -> StreamingResponse:
+    """Stream cards of collection in given format."""
+    chunks = iter_collection_cards(collection.id, config.export_chunk_size)
+    body = iter_csv(chunks) if format == ExportFormat.csv \
+        else iter_ndjson(chunks)
+    return StreamingResponse(body, media_type=MEDIA_TYPES[format], headers={
+        'Content-Disposition':
+            f'attachment; filename="collection-{collection.id}.{format.value}"'
+    })
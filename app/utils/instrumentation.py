@@ -0,0 +1,234 @@
+import asyncio
+import functools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Coroutine, Iterator, TypeVar
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from starlette.routing import BaseRoute, Route
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from tortoise.backends.sqlite.client import SqliteClient, TransactionWrapper
+
+from app.utils.metrics import (DB_PENDING, DB_QUERIES, DB_SECONDS,
+                               REQUEST_DURATION, REQUESTS_IN_FLIGHT)
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar('F', bound=Callable[..., Awaitable[Any]])
+
+QUERY_METHODS = ('execute_insert', 'execute_many', 'execute_query',
+                 'execute_query_dict', 'execute_script')
+
+
+class RequestTimings:
+    """Queries and time spent on parts of handling one request."""
+
+    def __init__(self) -> None:
+        self.route: str | None = None
+        self.queries = 0
+        self.db = 0.0
+        self.auth = 0.0
+        self.serialization = 0.0
+        self.endpoint_end: float | None = None
+        self.start = time.perf_counter()
+
+    def server_timing(self) -> str:
+        """Return value of Server-Timing header, durations in ms."""
+        total = time.perf_counter() - self.start
+        return ', '.join((
+            f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries"',
+            f'auth;dur={self.auth * 1000:.1f}',
+            f'serialization;dur={self.serialization * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+
+
+class RouteStats:
+    """Totals of requests handled by one route."""
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.queries = 0
+        self.db = 0.0
+        self.auth = 0.0
+        self.serialization = 0.0
+        self.total = 0.0
+
+    def add(self, timings: RequestTimings, total: float) -> None:
+        self.requests += 1
+        self.queries += timings.queries
+        self.db += timings.db
+        self.auth += timings.auth
+        self.serialization += timings.serialization
+        self.total += total
+
+
+request_timings: ContextVar[RequestTimings | None] = ContextVar(
+    'request_timings', default=None
+)
+# keyed by method and path template of route
+route_stats: dict[tuple[str, str], RouteStats] = {}
+
+
+@contextmanager
+def measure(part: str) -> Iterator[None]:
+    """Add time spent in the block to given part of current request."""
+    timings = request_timings.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            setattr(timings, part, getattr(timings, part)
+                    + time.perf_counter() - start)
+
+
+def measured(part: str) -> Callable[[F], F]:
+    """Decorate coroutine function to add its time to part of request."""
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with measure(part):
+                return await func(*args, **kwargs)
+        return wrapper  # type: ignore
+    return decorator
+
+
+def count_query(func: F) -> F:
+    """Count query of client method, also while it waits for connection."""
+    @functools.wraps(func)
+    async def wrapper(client: Any, *args: Any, **kwargs: Any) -> Any:
+        timings = request_timings.get()
+        if timings is not None:
+            timings.queries += 1
+        pending = DB_PENDING.labels(client.connection_name)
+        pending.inc()
+        try:
+            with measure('db'):
+                return await func(client, *args, **kwargs)
+        finally:
+            pending.dec()
+    wrapper.counts_queries = True  # type: ignore
+    return wrapper  # type: ignore
+
+
+def instrument_db_clients() -> None:
+    """Count and time queries of sqlite clients, transactions included."""
+    for client_class in (SqliteClient, TransactionWrapper):
+        for name in QUERY_METHODS:
+            method = client_class.__dict__.get(name)
+            if method is not None and not getattr(method, 'counts_queries',
+                                                  False):
+                setattr(client_class, name, count_query(method))
+
+
+class InstrumentedRoute(APIRoute):
+    """Route recording its path and time spent serializing its response.
+
+    Serialization covers validation and encoding of returned content,
+    which happen after endpoint returns.
+    """
+
+    def get_route_handler(
+        self
+    ) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        call = self.dependant.call
+        if call is not None and asyncio.iscoroutinefunction(call):
+            self.dependant.call = mark_endpoint_end(call)
+        handler = super().get_route_handler()
+
+        async def instrumented_handler(request: Request) -> Response:
+            timings = request_timings.get()
+            if timings is not None:
+                timings.route = self.path
+            response = await handler(request)
+            if timings is not None and timings.endpoint_end is not None:
+                timings.serialization += (time.perf_counter()
+                                          - timings.endpoint_end)
+            return response
+
+        return instrumented_handler
+
+
+def instrument_routes(routes: list[BaseRoute]) -> None:
+    """Record path of plain routes, like ones of docs, as API routes do."""
+    for route in routes:
+        if isinstance(route, Route) and not isinstance(route, APIRoute):
+            route.app = record_route(route.path, route.app)
+
+
+def record_route(path: str, app: ASGIApp) -> ASGIApp:
+    async def wrapper(scope: Scope, receive: Receive, send: Send) -> None:
+        timings = request_timings.get()
+        if timings is not None:
+            timings.route = path
+        await app(scope, receive, send)
+    return wrapper
+
+
+def mark_endpoint_end(endpoint: F) -> F:
+    @functools.wraps(endpoint)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            timings = request_timings.get()
+            if timings is not None:
+                timings.endpoint_end = time.perf_counter()
+    return wrapper  # type: ignore
+
+
+class InstrumentationMiddleware:
+    """Report queries and timings of every request.
+
+    They are sent in Server-Timing header, logged in one line and added
+    to totals and metrics of the route. Queries made after the response
+    started, like ones of streamed exports, are not in the header.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive,
+                       send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        timings = RequestTimings()
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                message['headers'] = [
+                    *message.get('headers', []),
+                    (b'server-timing', timings.server_timing().encode()),
+                ]
+            await send(message)
+
+        token = request_timings.set(timings)
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            request_timings.reset(token)
+            total = time.perf_counter() - timings.start
+            route = timings.route or 'unmatched'
+            route_stats.setdefault((scope['method'], route),
+                                   RouteStats()).add(timings, total)
+            REQUEST_DURATION.labels(scope['method'], route,
+                                    str(status_code)).observe(total)
+            DB_QUERIES.labels(route).inc(timings.queries)
+            DB_SECONDS.labels(route).inc(timings.db)
+            logger.info(
+                'method=%s route=%s status=%d queries=%d db_ms=%.1f '
+                'auth_ms=%.1f serialization_ms=%.1f total_ms=%.1f',
+                scope['method'], route, status_code, timings.queries,
+                timings.db * 1000, timings.auth * 1000,
+                timings.serialization * 1000, total * 1000
+            )
@@ -0,0 +1,126 @@
+from collections import defaultdict
+from typing import AsyncIterator, Iterable, cast
+
+from tortoise.queryset import QuerySet
+
+from app.models.models import (CardDB, CardTortoise, CollectionCardTortoise,
+                               CollectionDBLong, CollectionPublicShort,
+                               CollectionTortoise)
+
+CARD_FIELDS = ('id', 'title', 'content', 'creation', 'last_update')
+COLLECTION_SHORT_FIELDS = ('id', 'title', 'description', 'is_private')
+
+
+async def get_cards_collections(
+    card_ids: Iterable[int]
+) -> defaultdict[int, list[dict]]:
+    """Return collections of every card fetched with a single query."""
+    card_ids = list(card_ids)
+    cards_collections: defaultdict[int, list[dict]] = defaultdict(list)
+    if not card_ids:
+        return cards_collections
+
+    rows = await CollectionCardTortoise.filter(
+        card_id__in=card_ids
+    ).values('card_id', **{field: f'collection__{field}'
+                           for field in COLLECTION_SHORT_FIELDS})
+
+    for row in rows:
+        cards_collections[row.pop('card_id')].append(row)
+    return cards_collections
+
+
+async def add_collections(cards: list[dict]) -> list[dict]:
+    """Add collections to every card row in one query."""
+    cards_collections = await get_cards_collections(
+        card['id'] for card in cards
+    )
+    for card in cards:
+        card['collections'] = cards_collections[card['id']]
+    return cards
+
+
+async def load_card_rows(queryset: QuerySet[CardTortoise]) -> list[dict]:
+    """Return card rows of queryset with their collections in two queries."""
+    return await add_collections(
+        cast(list[dict], await queryset.values(*CARD_FIELDS))
+    )
+
+
+async def load_cards(queryset: QuerySet[CardTortoise]) -> list[CardDB]:
+    """Return cards of queryset with their collections in two queries."""
+    return [CardDB(**card) for card in await load_card_rows(queryset)]
+
+
+def get_collection_cards(collection_id: int) -> QuerySet:
+    """Return queryset of card rows of collection ordered by id."""
+    return CollectionCardTortoise.filter(
+        collection_id=collection_id
+    ).order_by('card_id')
+
+
+async def load_collection_card_rows(collection_id: int) -> list[dict]:
+    """Return card rows of collection with their collections."""
+    return await add_collections(cast(list[dict], (
+        await get_collection_cards(collection_id).values(
+            **{field: f'card__{field}' for field in CARD_FIELDS}
+        )
+    )))
+
+
+async def load_collection_cards(collection_id: int) -> list[CardDB]:
+    """Return cards of collection with their collections in two queries."""
+    return [CardDB(**card)
+            for card in await load_collection_card_rows(collection_id)]
+
+
+async def iter_collection_cards(collection_id: int,
+                                chunk_size: int) -> AsyncIterator[list[dict]]:
+    """Yield card rows of collection with their collections by chunks."""
+    last_id = 0
+    while True:
+        cards = cast(list[dict], await get_collection_cards(
+            collection_id
+        ).filter(card_id__gt=last_id).limit(chunk_size).values(
+            **{field: f'card__{field}' for field in CARD_FIELDS}
+        ))
+        if not cards:
+            return
+        yield await add_collections(cards)
+        if len(cards) < chunk_size:
+            return
+        last_id = cards[-1]['id']
+
+
+async def load_public_collections(
+    queryset: QuerySet[CollectionTortoise]
+) -> list[CollectionPublicShort]:
+    """Return collections of queryset with owner names in one query."""
+    collections = await queryset.values(*COLLECTION_SHORT_FIELDS,
+                                        owner_name='owner__name')
+    for col in collections:
+        col['owner'] = {'name': col.pop('owner_name')}
+    return [CollectionPublicShort(**col) for col in collections]
+
+
+def get_collection_fields(collection: CollectionTortoise) -> dict:
+    """Return fields of loaded collection used by long representations."""
+    return {
+        'id': collection.id,
+        'title': collection.title,
+        'description': collection.description,
+        'is_private': collection.is_private,
+        'last_update': collection.last_update,
+    }
+
+
+async def load_collection(collection: CollectionTortoise) -> CollectionDBLong:
+    """Return collection with all its cards in two queries."""
+    cards = await load_collection_cards(collection.id)
+    return CollectionDBLong(**get_collection_fields(collection), cards=cards)
+
+
+async def load_collection_row(collection: CollectionTortoise) -> dict:
+    """Return row of `load_collection` without building models."""
+    cards = await load_collection_card_rows(collection.id)
+    return {**get_collection_fields(collection), 'cards': cards}
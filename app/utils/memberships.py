@@ -0,0 +1,74 @@
+from typing import Iterable, Sequence
+
+from tortoise import BaseDBAsyncClient, timezone
+
+# Both statements check ownership of requested collections themselves, so a
+# membership change costs one query per statement whatever their number.
+ADD_QUERY = (
+    'INSERT OR IGNORE INTO "collections_cards" '
+    '("collections_id", "cardtortoise_id") '
+    'SELECT "id", ? FROM "collections" '
+    'WHERE "owner_id" = ? AND "id" IN ({ids})'
+)
+REMOVE_QUERY = (
+    'DELETE FROM "collections_cards" WHERE "cardtortoise_id" = ? '
+    'AND "collections_id" NOT IN ('
+    'SELECT "id" FROM "collections" WHERE "owner_id" = ? AND "id" IN ({ids}))'
+)
+
+# Links carry no time of their own, so membership changes are dated on
+# collections and cards to keep their Last-Modified in step with ETag.
+TOUCH_COLLECTIONS_QUERY = (
+    'UPDATE "collections" SET "last_update" = ? WHERE "id" IN ({ids})'
+)
+TOUCH_COLLECTION_CARDS_QUERY = (
+    'UPDATE "cards" SET "last_update" = ? WHERE "id" IN ('
+    'SELECT "cardtortoise_id" FROM "collections_cards" '
+    'WHERE "collections_id" = ?)'
+)
+
+
+def placeholders(values: Sequence) -> str:
+    return ', '.join('?' * len(values))
+
+
+async def add_card_collections(connection: BaseDBAsyncClient, card_id: int,
+                               owner_id: int,
+                               collection_ids: Sequence[int]) -> None:
+    """Add card to those of collections that belong to owner."""
+    if collection_ids:
+        await connection.execute_query(
+            ADD_QUERY.format(ids=placeholders(collection_ids)),
+            [card_id, owner_id, *collection_ids]
+        )
+
+
+async def set_card_collections(connection: BaseDBAsyncClient, card_id: int,
+                               owner_id: int,
+                               collection_ids: Sequence[int]) -> None:
+    """Make owner's collections among given ones the only ones of card."""
+    await connection.execute_query(
+        REMOVE_QUERY.format(ids=placeholders(collection_ids)),
+        [card_id, owner_id, *collection_ids]
+    )
+    await add_card_collections(connection, card_id, owner_id, collection_ids)
+
+
+async def touch_collections(connection: BaseDBAsyncClient,
+                            collection_ids: Iterable[int]) -> None:
+    """Date collections whose cards were added or removed."""
+    ids = list(set(collection_ids))
+    if ids:
+        await connection.execute_query(
+            TOUCH_COLLECTIONS_QUERY.format(ids=placeholders(ids)),
+            [timezone.now().isoformat(' '), *ids]
+        )
+
+
+async def touch_collection_cards(connection: BaseDBAsyncClient,
+                                 collection_id: int) -> None:
+    """Date cards of collection, which is about to be deleted."""
+    await connection.execute_query(
+        TOUCH_COLLECTION_CARDS_QUERY,
+        [timezone.now().isoformat(' '), collection_id]
+    )
@@ -0,0 +1,102 @@
+import os
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+
+# Metrics of every worker are written to files in this directory and
+# summed up on scrape, see prometheus_client multiprocess mode.
+MULTIPROCESS_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+REQUEST_DURATION = Histogram(
+    'flashcards_http_request_duration_seconds',
+    'Time of handling requests by route template and status.',
+    ['method', 'route', 'status'],
+    buckets=(.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10),
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'flashcards_http_requests_in_flight',
+    'Requests being handled.',
+    multiprocess_mode='livesum',
+)
+DB_QUERIES = Counter(
+    'flashcards_db_queries',
+    'Queries made while handling requests by route template.',
+    ['route'],
+)
+DB_SECONDS = Counter(
+    'flashcards_db_seconds',
+    'Time spent on queries while handling requests by route template.',
+    ['route'],
+)
+DB_PENDING = Gauge(
+    'flashcards_db_connection_queries',
+    'Queries waiting for or running on database connection.',
+    ['connection'],
+    multiprocess_mode='livesum',
+)
+PASSWORD_POOL_PENDING = Gauge(
+    'flashcards_password_pool_pending',
+    'Password hashing jobs running or queued.',
+    multiprocess_mode='livesum',
+)
+PASSWORD_POOL_WORKERS = Gauge(
+    'flashcards_password_pool_workers',
+    'Threads hashing passwords.',
+    multiprocess_mode='livesum',
+)
+CACHE_REQUESTS = Counter(
+    'flashcards_cache_requests',
+    'Lookups of token and response caches by result.',
+    ['cache', 'result'],
+)
+TOKENS_PURGED = Counter(
+    'flashcards_tokens_purged',
+    'Expired access tokens deleted by background purge.',
+)
+PURGE_DURATION = Histogram(
+    'flashcards_token_purge_duration_seconds',
+    'Time of passes of background purge of expired tokens.',
+    buckets=(.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10),
+)
+RATE_LIMITED = Counter(
+    'flashcards_rate_limited',
+    'Login and registration attempts answered with 429.',
+)
+SQLITE_BYTES = Gauge(
+    'flashcards_sqlite_bytes',
+    'Size of database file, its free pages and page cache limit.',
+    ['kind'],
+    multiprocess_mode='livemax',
+)
+COMPRESSION_BYTES = Counter(
+    'flashcards_compression_bytes',
+    'Bytes of response bodies before and after compression by encoding.',
+    ['encoding', 'stage'],
+)
+STARTUP_SECONDS = Gauge(
+    'flashcards_startup_seconds',
+    'Time spent on phases of worker startup.',
+    ['phase'],
+    multiprocess_mode='livemax',
+)
+
+
+def get_registry() -> CollectorRegistry:
+    """Return registry collecting metrics of all workers."""
+    if MULTIPROCESS_DIR is None:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Return metrics in text exposition format and its content type."""
+    return generate_latest(get_registry()), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead() -> None:
+    """Drop live gauges of exiting worker."""
+    if MULTIPROCESS_DIR is not None:
+        multiprocess.mark_process_dead(os.getpid())
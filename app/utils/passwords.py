@@ -1,16 +1,78 @@
+import asyncio
 import secrets
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, TypeVar
 
-from passlib.context import CryptContext
+from fastapi import HTTPException, status
 
-pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
+from app.config import config
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+T = TypeVar('T')
+
+
+@lru_cache()
+def get_password_context() -> 'CryptContext':
+    """Return password context with loaded bcrypt backend.
+
+    Passlib is imported on first use, it takes a noticeable part of startup.
+    """
+    from passlib.context import CryptContext
+    context = CryptContext(schemes=['bcrypt'], deprecated='auto')
+    context.handler().get_backend()
+    return context
+
+
+class HashingPool:
+    """Thread pool for password hashing with bounded queue."""
+
+    def __init__(self, max_workers: int, queue_limit: int) -> None:
+        self.max_workers = max_workers
+        self.capacity = max_workers + queue_limit
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(max_workers,
+                                            thread_name_prefix='passwords')
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        """Run func in pool, 503 if pool is saturated."""
+        if self.pending >= self.capacity:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': '1'}
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, func, *args
+            )
+        finally:
+            self.pending -= 1
+
+
+hashing_pool = HashingPool(max_workers=config.password_pool_size,
+                           queue_limit=config.password_queue_limit)
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_password_context().hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_password_context().verify(plain_password, hashed_password)
+
+
+async def hash_password(password: str) -> str:
+    """Hash password without blocking event loop."""
+    return await hashing_pool.run(get_password_hash, password)
+
+
+async def check_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify password without blocking event loop."""
+    return await hashing_pool.run(verify_password,
+                                  plain_password, hashed_password)
 
 
 def generate_token() -> str:
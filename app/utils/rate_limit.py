@@ -0,0 +1,155 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Protocol
+
+import aiosqlite
+from fastapi import HTTPException, status
+
+from app.config import config
+from app.utils.database import connect_shared_store
+
+
+class Rate(NamedTuple):
+    """Bucket of `burst` tokens refilled by `per_minute` tokens a minute."""
+    per_minute: float
+    burst: int
+
+    def refill(self, tokens: float, elapsed: float) -> float:
+        return min(self.burst, tokens + elapsed * self.per_minute / 60)
+
+    def retry_after(self, tokens: float) -> float:
+        """Return seconds until bucket holds a whole token."""
+        return (1 - tokens) * 60 / self.per_minute
+
+
+class BucketStore(Protocol):
+    """Storage of token buckets."""
+
+    async def take(self, key: str, rate: Rate, now: float) -> float:
+        """Take a token, return 0 or seconds to wait if bucket is empty."""
+        ...
+
+    async def close(self) -> None:
+        ...
+
+
+class MemoryStore:
+    """Buckets of one process, least recently used are dropped over limit."""
+
+    def __init__(self, max_keys: int) -> None:
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def take(self, key: str, rate: Rate, now: float) -> float:
+        tokens, updated = self._buckets.pop(key, (rate.burst, now))
+        tokens = rate.refill(tokens, now - updated)
+        allowed = tokens >= 1
+        self._buckets[key] = (tokens - allowed, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return 0 if allowed else rate.retry_after(tokens)
+
+    async def close(self) -> None:
+        pass
+
+
+class SqliteStore:
+    """Buckets in a local database file shared by worker processes.
+
+    A bucket is refilled and taken from in one statement, so concurrent
+    workers never take the same token twice.
+    """
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS "buckets" ("key" TEXT PRIMARY KEY, '
+        '"tokens" REAL NOT NULL, "updated" REAL NOT NULL, '
+        '"allowed" INT NOT NULL)',
+    )
+    TAKE_QUERY = (
+        'INSERT INTO "buckets" VALUES (:key, :burst - 1, :now, 1) '
+        'ON CONFLICT ("key") DO UPDATE SET '
+        '"allowed" = MIN(:burst, "tokens" + (:now - "updated") * :rate) >= 1, '
+        '"tokens" = MIN(:burst, "tokens" + (:now - "updated") * :rate) '
+        '- (MIN(:burst, "tokens" + (:now - "updated") * :rate) >= 1), '
+        '"updated" = :now '
+        'RETURNING "tokens", "allowed"'
+    )
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._connection: aiosqlite.Connection | None = None
+        self._connecting = asyncio.Lock()
+
+    async def connect(self) -> aiosqlite.Connection:
+        async with self._connecting:
+            if self._connection is None:
+                self._connection = await connect_shared_store(self.path,
+                                                              self.SCHEMA)
+        return self._connection
+
+    async def take(self, key: str, rate: Rate, now: float) -> float:
+        connection = await self.connect()
+        rows = list(await connection.execute_fetchall(self.TAKE_QUERY, {
+            'key': key, 'burst': rate.burst, 'now': now,
+            'rate': rate.per_minute / 60,
+        }))
+        tokens, allowed = rows[0]
+        return 0 if allowed else rate.retry_after(tokens)
+
+    async def close(self) -> None:
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+
+class RateLimiter:
+    """Limit attempts by client address and by email."""
+
+    def __init__(self, store: BucketStore | None, ip_rate: Rate,
+                 email_rate: Rate) -> None:
+        self.store = store
+        self.ip_rate = ip_rate
+        self.email_rate = email_rate
+        self.limited = 0
+
+    async def check(self, ip: str | None, email: str) -> None:
+        """Take tokens of address and email, 429 if either is exhausted.
+
+        Email is only checked for addresses within their limit.
+        """
+        if self.store is None:
+            return
+        now = time.time()
+        buckets = [(f'email:{email.lower()}', self.email_rate)]
+        if ip is not None:
+            buckets.insert(0, (f'ip:{ip}', self.ip_rate))
+        for key, rate in buckets:
+            retry_after = await self.store.take(key, rate, now)
+            if retry_after > 0:
+                self.limited += 1
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    headers={'Retry-After': str(math.ceil(retry_after))}
+                )
+
+    async def close(self) -> None:
+        if self.store is not None:
+            await self.store.close()
+
+
+def get_store() -> BucketStore | None:
+    if config.rate_limit_backend == 'memory':
+        return MemoryStore(config.rate_limit_max_keys)
+    if config.rate_limit_backend == 'sqlite':
+        return SqliteStore(config.rate_limit_path)
+    return None
+
+
+rate_limiter = RateLimiter(
+    get_store(),
+    ip_rate=Rate(config.rate_limit_ip_per_minute, config.rate_limit_ip_burst),
+    email_rate=Rate(config.rate_limit_email_per_minute,
+                    config.rate_limit_email_burst),
+)
@@ -0,0 +1,296 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Iterable, NamedTuple, Protocol
+
+import aiosqlite
+from fastapi import Response
+from tortoise.expressions import Subquery
+from tortoise.queryset import QuerySet
+
+from app.config import config
+from app.models.models import CardTortoise, CollectionCardTortoise
+from app.utils.database import connect_shared_store
+
+PUBLIC_COLLECTIONS_SCOPE = 'public_collections'
+
+
+def collection_scope(id: int) -> str:
+    return f'collection:{id}'
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    headers: dict[str, str]
+
+    def dump(self) -> bytes:
+        return json.dumps(self.headers).encode() + b'\n' + self.body
+
+    @classmethod
+    def load(cls, value: bytes) -> 'CachedResponse':
+        headers, _, body = value.partition(b'\n')
+        return cls(body=body, headers=json.loads(headers))
+
+
+def get_cached_headers(response: Response) -> dict[str, str]:
+    """Return headers of rendered response worth storing with its body."""
+    return {key: value for key, value in response.headers.items()
+            if key not in ('content-length', 'content-type')}
+
+
+class CacheBackend(Protocol):
+    """Storage of cached values grouped by invalidation scopes.
+
+    Every scope has a generation which grows on invalidation. Values are
+    stored along with generation of their scope at the start of their build
+    and are served only while it is current, so a value built from data
+    changed meanwhile is never served.
+    """
+
+    async def get(self, key: str, scope: str) -> bytes | None:
+        ...
+
+    async def generation(self, scope: str) -> int:
+        ...
+
+    async def set(self, key: str, scope: str, generation: int,
+                  value: bytes) -> None:
+        ...
+
+    async def invalidate(self, *scopes: str) -> None:
+        ...
+
+    async def close(self) -> None:
+        ...
+
+
+class MemoryBackend:
+    """Per process LRU storage bounded by total size of values."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict[str, tuple[str, int, bytes]] = \
+            OrderedDict()
+        self._generations: dict[str, int] = {}
+
+    async def get(self, key: str, scope: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[1] != self._generations.get(scope, 0):
+            return None
+        self._entries.move_to_end(key)
+        return entry[2]
+
+    async def generation(self, scope: str) -> int:
+        return self._generations.get(scope, 0)
+
+    async def set(self, key: str, scope: str, generation: int,
+                  value: bytes) -> None:
+        if (generation != self._generations.get(scope, 0)
+                or len(value) > self.max_bytes):
+            return
+        self._pop(key)
+        self._entries[key] = (scope, generation, value)
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            self._pop(next(iter(self._entries)))
+
+    async def invalidate(self, *scopes: str) -> None:
+        for scope in scopes:
+            self._generations[scope] = self._generations.get(scope, 0) + 1
+        # keys of single objects are their scopes
+        for scope in scopes:
+            self._pop(scope)
+
+    async def close(self) -> None:
+        pass
+
+    def _pop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[2])
+
+
+class SqliteBackend:
+    """LRU storage in a local database file shared by worker processes."""
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS "entries" ("key" TEXT PRIMARY KEY, '
+        '"scope" TEXT NOT NULL, "generation" INT NOT NULL, '
+        '"value" BLOB NOT NULL, "accessed" REAL NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS "idx_entries_scope" '
+        'ON "entries" ("scope")',
+        'CREATE TABLE IF NOT EXISTS "generations" ('
+        '"scope" TEXT PRIMARY KEY, "generation" INT NOT NULL)',
+    )
+    # keeps the most recently used entries fitting into max_bytes
+    EVICT_QUERY = (
+        'DELETE FROM "entries" WHERE "key" IN (SELECT "key" FROM ('
+        'SELECT "key", SUM(LENGTH("value")) OVER (ORDER BY "accessed" DESC) '
+        '"total" FROM "entries") WHERE "total" > ?)'
+    )
+
+    def __init__(self, path: str, max_bytes: int) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self._connection: aiosqlite.Connection | None = None
+        self._connecting = asyncio.Lock()
+
+    async def connect(self) -> aiosqlite.Connection:
+        async with self._connecting:
+            if self._connection is None:
+                self._connection = await connect_shared_store(self.path,
+                                                              self.SCHEMA)
+        return self._connection
+
+    async def get(self, key: str, scope: str) -> bytes | None:
+        connection = await self.connect()
+        rows = list(await connection.execute_fetchall(
+            'SELECT "value" FROM "entries" WHERE "key" = ? AND "generation" '
+            '= IFNULL((SELECT "generation" FROM "generations" '
+            'WHERE "scope" = ?), 0)', [key, scope]
+        ))
+        if not rows:
+            return None
+        await connection.execute(
+            'UPDATE "entries" SET "accessed" = ? WHERE "key" = ?',
+            [time.time(), key]
+        )
+        return rows[0][0]
+
+    async def generation(self, scope: str) -> int:
+        connection = await self.connect()
+        rows = list(await connection.execute_fetchall(
+            'SELECT "generation" FROM "generations" WHERE "scope" = ?',
+            [scope]
+        ))
+        return rows[0][0] if rows else 0
+
+    async def set(self, key: str, scope: str, generation: int,
+                  value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        connection = await self.connect()
+        await connection.execute(
+            'INSERT OR REPLACE INTO "entries" '
+            'SELECT ?, ?, ?, ?, ? WHERE ? = IFNULL((SELECT "generation" '
+            'FROM "generations" WHERE "scope" = ?), 0)',
+            [key, scope, generation, value, time.time(), generation, scope]
+        )
+        await connection.execute(self.EVICT_QUERY, [self.max_bytes])
+
+    async def invalidate(self, *scopes: str) -> None:
+        connection = await self.connect()
+        await connection.executemany(
+            'INSERT INTO "generations" VALUES (?, 1) ON CONFLICT ("scope") '
+            'DO UPDATE SET "generation" = "generation" + 1',
+            [[scope] for scope in scopes]
+        )
+        await connection.executemany(
+            'DELETE FROM "entries" WHERE "scope" = ?',
+            [[scope] for scope in scopes]
+        )
+
+    async def close(self) -> None:
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+
+class ResponseCache:
+    """Cache of serialized responses with coalesced builds.
+
+    Concurrent misses of the same key within a process share one build.
+    """
+
+    def __init__(self, backend: CacheBackend | None) -> None:
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._builds: dict[str, asyncio.Task] = {}
+
+    async def get_or_build(
+        self, key: str, scope: str,
+        build: Callable[[], Awaitable[CachedResponse]]
+    ) -> CachedResponse:
+        """Return cached response or build and store it."""
+        if self.backend is None:
+            return await build()
+        value = await self.backend.get(key, scope)
+        if value is not None:
+            self.hits += 1
+            return CachedResponse.load(value)
+        self.misses += 1
+
+        task = self._builds.get(key)
+        if task is None:
+            task = asyncio.create_task(self._build(key, scope, build))
+            self._builds[key] = task
+            task.add_done_callback(lambda _: self._builds.pop(key, None))
+        # build goes on for other requests if this one is cancelled
+        return await asyncio.shield(task)
+
+    async def _build(
+        self, key: str, scope: str,
+        build: Callable[[], Awaitable[CachedResponse]]
+    ) -> CachedResponse:
+        assert self.backend is not None
+        generation = await self.backend.generation(scope)
+        response = await build()
+        await self.backend.set(key, scope, generation, response.dump())
+        return response
+
+    async def invalidate(self, *scopes: str) -> None:
+        if self.backend is not None and scopes:
+            await self.backend.invalidate(*scopes)
+
+    async def invalidate_collections(self, collection_ids: Iterable[int],
+                                     listing: bool = False) -> None:
+        """Drop responses of collections and optionally public listing."""
+        scopes = [collection_scope(id) for id in set(collection_ids)]
+        if listing:
+            scopes.append(PUBLIC_COLLECTIONS_SCOPE)
+        await self.invalidate(*scopes)
+
+    async def close(self) -> None:
+        if self.backend is not None:
+            await self.backend.close()
+
+    def stats(self) -> dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses,
+                'builds': len(self._builds)}
+
+
+async def get_cards_collection_ids(
+    cards: QuerySet[CardTortoise]
+) -> list[int]:
+    """Return ids of collections containing any of cards."""
+    return list(await CollectionCardTortoise.filter(
+        card_id__in=Subquery(cards.values('id'))
+    ).distinct().values_list('collection_id', flat=True))
+
+
+async def get_related_collection_ids(collection_id: int) -> list[int]:
+    """Return ids of collections sharing cards with collection, and its own.
+
+    Cards list all their collections, so those are affected by changes of
+    collection as well.
+    """
+    return [collection_id, *await CollectionCardTortoise.filter(
+        card_id__in=Subquery(CollectionCardTortoise.filter(
+            collection_id=collection_id
+        ).values('card_id'))
+    ).distinct().values_list('collection_id', flat=True)]
+
+
+def get_backend() -> CacheBackend | None:
+    if config.response_cache_backend == 'memory':
+        return MemoryBackend(config.response_cache_max_bytes)
+    if config.response_cache_backend == 'sqlite':
+        return SqliteBackend(config.response_cache_path,
+                             config.response_cache_max_bytes)
+    return None
+
+
+response_cache = ResponseCache(get_backend())
@@ -0,0 +1,122 @@
+from typing import Any
+
+from fastapi import HTTPException, status
+from tortoise import connections
+
+from app.models.models import CardSearchHit
+from app.utils.database import get_read_connection
+from app.utils.loaders import CARD_FIELDS
+from app.utils.utils import Pagination
+
+# Table `cards_fts` indexes title and content of cards, triggers keep it
+# in sync with `cards`. Prefix indexes serve incomplete last word of query.
+# Statements are also shipped as migration.
+SEARCH_SCHEMA = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS "cards_fts" USING fts5('
+    '"title", "content", content="cards", content_rowid="id", '
+    'tokenize="unicode61 remove_diacritics 2", prefix="2 3")',
+    'CREATE TRIGGER IF NOT EXISTS "cards_fts_insert" AFTER INSERT ON "cards" '
+    'BEGIN INSERT INTO "cards_fts" ("rowid", "title", "content") '
+    'VALUES (new."id", new."title", new."content"); END',
+    'CREATE TRIGGER IF NOT EXISTS "cards_fts_delete" AFTER DELETE ON "cards" '
+    'BEGIN INSERT INTO "cards_fts" ("cards_fts", "rowid", "title", '
+    '"content") VALUES (\'delete\', old."id", old."title", old."content"); '
+    'END',
+    'CREATE TRIGGER IF NOT EXISTS "cards_fts_update" '
+    'AFTER UPDATE OF "title", "content" ON "cards" '
+    'BEGIN INSERT INTO "cards_fts" ("cards_fts", "rowid", "title", '
+    '"content") VALUES (\'delete\', old."id", old."title", old."content"); '
+    'INSERT INTO "cards_fts" ("rowid", "title", "content") '
+    'VALUES (new."id", new."title", new."content"); END',
+)
+
+# Title matches weigh twice as much as content ones
+RANK = 'bm25("cards_fts", 2.0, 1.0)'
+
+CARD_COLUMNS = ', '.join(f'"cards"."{field}"' for field in CARD_FIELDS)
+
+SEARCH_QUERY = f'''
+SELECT "hits"."rank", {CARD_COLUMNS}
+FROM (
+    SELECT "rowid" AS "id", {RANK} AS "rank"
+    FROM "cards_fts" WHERE "cards_fts" MATCH ?
+) AS "hits"
+JOIN "cards" ON "cards"."id" = "hits"."id"
+WHERE ({{scope}}) AND ("hits"."rank", "hits"."id") > (?, ?)
+ORDER BY "hits"."rank", "hits"."id"
+LIMIT ? OFFSET ?
+'''
+
+OWN_SCOPE = '"cards"."owner_id" = ?'
+PUBLIC_SCOPE = '''EXISTS (
+    SELECT 1 FROM "collections_cards"
+    JOIN "collections"
+    ON "collections"."id" = "collections_cards"."collections_id"
+    WHERE "collections_cards"."cardtortoise_id" = "cards"."id"
+    AND "collections"."is_private" = 0
+)'''
+
+SNIPPETS_QUERY = '''
+SELECT "rowid" AS "id",
+    snippet("cards_fts", -1, '<b>', '</b>', '…', 16) AS "snippet"
+FROM "cards_fts" WHERE "cards_fts" MATCH ? AND "rowid" IN ({ids})
+'''
+
+
+async def create_search_index() -> None:
+    """Create full-text index of cards, fill it if it was just created."""
+    connection = connections.get('default')
+    exists = await connection.execute_query_dict(
+        'SELECT 1 FROM "sqlite_master" WHERE "name" = \'cards_fts\''
+    )
+    for statement in SEARCH_SCHEMA:
+        await connection.execute_script(statement)
+    if not exists:
+        await connection.execute_script(
+            'INSERT INTO "cards_fts" ("cards_fts") VALUES (\'rebuild\')'
+        )
+
+
+def to_match_query(query: str) -> str:
+    """Return FTS5 query matching all words of query, last one by prefix."""
+    words = ['"{}"'.format(word.replace('"', '""'))
+             for word in query.split()]
+    if words:
+        words[-1] += '*'
+    return ' '.join(words)
+
+
+async def search_cards(query: str, owner_id: int, include_public: bool,
+                       pagination: Pagination) -> list[CardSearchHit]:
+    """Return cards matching query ordered by relevance.
+
+    Rank is BM25 score, the lower the better. Cursor of pagination holds
+    rank and id of the last hit of previous page.
+    """
+    match = to_match_query(query)
+    if not match or not pagination.limit:
+        return []
+    scope = f'{OWN_SCOPE} OR {PUBLIC_SCOPE}' if include_public else OWN_SCOPE
+    if pagination.after is not None:
+        rank = pagination.after.get('rank')
+        if not isinstance(rank, (int, float)):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail='Invalid cursor')
+        after, skip = (rank, pagination.after['id']), 0
+    else:
+        after, skip = (float('-inf'), 0), pagination.skip
+
+    connection = get_read_connection()
+    rows: list[dict[str, Any]] = await connection.execute_query_dict(
+        SEARCH_QUERY.format(scope=scope),
+        [match, owner_id, *after, pagination.limit, skip]
+    )
+    if not rows:
+        return []
+    snippets = {row['id']: row['snippet'] for row in
+                await connection.execute_query_dict(
+                    SNIPPETS_QUERY.format(ids=', '.join('?' * len(rows))),
+                    [match, *(row['id'] for row in rows)]
+                )}
+    return [CardSearchHit(**row, snippet=snippets.get(row['id'], ''))
+            for row in rows]
@@ -0,0 +1,82 @@
+import logging
+import os
+import time
+from pathlib import Path
+
+from tortoise import connections
+from tortoise.exceptions import OperationalError
+
+from app import IMPORT_START
+from app.utils.metrics import STARTUP_SECONDS
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).parents[2] / 'migrations' / 'models'
+
+LAST_MIGRATION_QUERY = (
+    'SELECT "version" FROM "aerich" WHERE "app" = ? '
+    'ORDER BY "id" DESC LIMIT 1'
+)
+
+
+class StartupReport:
+    """Time spent on consecutive phases of startup, each ends with mark.
+
+    The first phase starts on import of `app` package, so interpreter
+    startup and imports of server are not included.
+    """
+
+    def __init__(self, start: float) -> None:
+        self.phases: dict[str, float] = {}
+        self._last = start
+
+    def mark(self, phase: str) -> None:
+        """End phase started by previous mark."""
+        now = time.perf_counter()
+        self.record(phase, now - self._last)
+        self._last = now
+
+    def record(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = seconds
+        STARTUP_SECONDS.labels(phase).set(seconds)
+
+    def log(self) -> None:
+        logger.info('startup took %.1fms: %s',
+                    sum(self.phases.values()) * 1000,
+                    ' '.join(f'{phase}={seconds * 1000:.1f}ms'
+                             for phase, seconds in self.phases.items()))
+
+
+def get_migration_number(version: str) -> int:
+    return int(version.split('_', 1)[0])
+
+
+async def get_applied_migration() -> str | None:
+    """Return the last migration applied to database, if any."""
+    try:
+        rows = await connections.get('default').execute_query_dict(
+            LAST_MIGRATION_QUERY, ['models']
+        )
+    except OperationalError:
+        # aerich table does not exist
+        return None
+    return rows[0]['version'] if rows else None
+
+
+async def check_migrations(directory: Path = MIGRATIONS_DIR) -> None:
+    """Raise if the latest migration in directory is not applied.
+
+    Schema is only changed by `aerich upgrade` in production and in
+    databases that were migrated once. Newer migrations than known are
+    allowed, so workers of previous release keep running during upgrade.
+    """
+    latest = max((name for name in os.listdir(directory)
+                  if name.endswith('.sql')), key=get_migration_number)
+    applied = await get_applied_migration()
+    if (applied is None
+            or get_migration_number(applied) < get_migration_number(latest)):
+        raise RuntimeError(f'database is at migration {applied}, {latest} '
+                           f'is required, run `aerich upgrade`')
+
+
+startup_report = StartupReport(IMPORT_START)
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+
+from prometheus_client import Counter
+from tortoise import connections, timezone
+
+from app.config import config
+from app.dependencies import token_cache
+from app.models.authentication import AccessTokenTortoise, RevokedTokenTortoise
+from app.utils.metrics import (CACHE_REQUESTS, PASSWORD_POOL_PENDING,
+                               PASSWORD_POOL_WORKERS, PURGE_DURATION,
+                               RATE_LIMITED, SQLITE_BYTES, TOKENS_PURGED)
+from app.utils.passwords import hashing_pool
+from app.utils.rate_limit import rate_limiter
+from app.utils.response_cache import response_cache
+from app.utils.tokens import RevocationSet, revoked_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask(ABC):
+    """Run `step` every `interval` seconds in background, 0 disables it.
+
+    First step runs one interval after start.
+    """
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    @abstractmethod
+    async def step(self) -> None:
+        """Do one round of work."""
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.step()
+            except Exception:
+                logger.exception('%s failed', type(self).__name__)
+
+    def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class TokenPurger(PeriodicTask):
+    """Periodically delete expired access tokens in bounded batches."""
+
+    def __init__(self, interval: float, batch_size: int,
+                 revocations: RevocationSet = revoked_tokens) -> None:
+        super().__init__(interval)
+        self.batch_size = batch_size
+        self.revocations = revocations
+        self.passes = 0
+        self.purged = 0
+        self.last_purged = 0
+        self.last_duration = 0.0
+
+    async def purge(self) -> int:
+        """Delete all tokens expired by now, return their number.
+
+        Revocations of expired signed tokens are dropped as well.
+        """
+        start = time.perf_counter()
+        now = timezone.now()
+        purged = 0
+        while True:
+            tokens = await AccessTokenTortoise.filter(
+                expiration__lt=now
+            ).limit(self.batch_size).values_list('access_token', flat=True)
+            if tokens:
+                purged += await AccessTokenTortoise.filter(
+                    access_token__in=tokens
+                ).delete()
+            if len(tokens) < self.batch_size:
+                break
+            # let requests in between batches
+            await asyncio.sleep(0)
+        await RevokedTokenTortoise.filter(expiration__lt=now).delete()
+        self.revocations.prune()
+
+        self.passes += 1
+        self.purged += purged
+        self.last_purged = purged
+        self.last_duration = time.perf_counter() - start
+        PURGE_DURATION.observe(self.last_duration)
+        logger.info('Purged %d expired access tokens in %.1f ms',
+                    purged, self.last_duration * 1000)
+        return purged
+
+    async def step(self) -> None:
+        await self.purge()
+
+    def stats(self) -> dict[str, float]:
+        """Return purge counters and duration of last pass in seconds."""
+        return {
+            'passes': self.passes,
+            'purged': self.purged,
+            'last_purged': self.last_purged,
+            'last_duration': self.last_duration,
+        }
+
+
+class RevocationSync(PeriodicTask):
+    """Pick up signed tokens revoked by other processes."""
+
+    def __init__(self, interval: float,
+                 revocations: RevocationSet = revoked_tokens) -> None:
+        super().__init__(interval)
+        self.revocations = revocations
+
+    async def step(self) -> None:
+        await self.revocations.load()
+
+
+class MetricsSampler(PeriodicTask):
+    """Copy state of pools, caches and database of worker to metrics.
+
+    Every worker samples its own state, so values are summed up correctly
+    across workers in multiprocess mode.
+    """
+
+    def __init__(self, interval: float) -> None:
+        super().__init__(interval)
+        self._counted: dict[tuple, float] = {}
+
+    def count(self, counter: Counter, total: float, *labels: str) -> None:
+        """Advance counter to total of underlying counter."""
+        key = (counter, *labels)
+        delta = total - self._counted.get(key, 0)
+        if delta > 0:
+            (counter.labels(*labels) if labels else counter).inc(delta)
+        self._counted[key] = total
+
+    async def step(self) -> None:
+        PASSWORD_POOL_PENDING.set(hashing_pool.pending)
+        PASSWORD_POOL_WORKERS.set(hashing_pool.max_workers)
+        for cache, stats in (('token', token_cache.stats()),
+                             ('response', response_cache.stats())):
+            self.count(CACHE_REQUESTS, stats['hits'], cache, 'hit')
+            self.count(CACHE_REQUESTS, stats['misses'], cache, 'miss')
+        self.count(TOKENS_PURGED, token_purger.purged)
+        self.count(RATE_LIMITED, rate_limiter.limited)
+
+        connection = connections.get('default')
+        pragmas = {}
+        for pragma in ('page_count', 'freelist_count', 'page_size',
+                       'cache_size'):
+            rows = await connection.execute_query_dict(f'PRAGMA {pragma}')
+            pragmas[pragma] = list(rows[0].values())[0]
+        page_size = pragmas['page_size']
+        cache_size = pragmas['cache_size']
+        SQLITE_BYTES.labels('database').set(pragmas['page_count'] * page_size)
+        SQLITE_BYTES.labels('free').set(pragmas['freelist_count'] * page_size)
+        # negative cache size is a limit in KiB
+        SQLITE_BYTES.labels('cache_limit').set(
+            -cache_size * 1024 if cache_size < 0 else cache_size * page_size
+        )
+
+
+token_purger = TokenPurger(interval=config.token_purge_interval,
+                           batch_size=config.token_purge_batch_size)
+revocation_sync = RevocationSync(
+    interval=config.token_revocation_sync_interval
+)
+metrics_sampler = MetricsSampler(interval=config.metrics_sample_interval)
@@ -0,0 +1,128 @@
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+from datetime import datetime
+from typing import NamedTuple
+
+from tortoise import timezone
+
+from app.config import config
+from app.models.authentication import RevokedTokenTortoise
+
+SIGNED_TOKEN_PREFIX = 'v1.'
+
+
+class SignedToken(NamedTuple):
+    user_id: int
+    expiration: datetime
+    token_id: str
+
+
+class Revocation(NamedTuple):
+    token_id: str
+    expiration: datetime
+
+
+def b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def get_signature(payload: str) -> str:
+    return b64encode(hmac.new(config.token_secret.encode(), payload.encode(),
+                              hashlib.sha256).digest())
+
+
+def sign_token(user_id: int, expiration: datetime) -> str:
+    """Return token carrying user id and expiration signed with secret."""
+    payload = b64encode(json.dumps({
+        'sub': user_id,
+        'exp': int(expiration.timestamp()),
+        'jti': secrets.token_urlsafe(12),
+    }, separators=(',', ':')).encode())
+    return f'{SIGNED_TOKEN_PREFIX}{payload}.{get_signature(payload)}'
+
+
+def read_signed_token(token: str) -> SignedToken | None:
+    """Return content of signed token, None if it is malformed or forged.
+
+    Expiration is not checked here.
+    """
+    if not token.startswith(SIGNED_TOKEN_PREFIX) or not config.token_secret:
+        return None
+    payload, _, signature = token[len(SIGNED_TOKEN_PREFIX):].partition('.')
+    if not hmac.compare_digest(signature.encode(),
+                               get_signature(payload).encode()):
+        return None
+    try:
+        claims = json.loads(b64decode(payload))
+        return SignedToken(
+            user_id=int(claims['sub']),
+            expiration=datetime.fromtimestamp(claims['exp']).astimezone(),
+            token_id=str(claims['jti']),
+        )
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+def get_opaque_token_id(token: str) -> str:
+    """Return id under which revocation of opaque token is stored."""
+    return hashlib.blake2b(token.encode(), digest_size=16).hexdigest()
+
+
+class RevocationSet:
+    """Ids of revoked tokens which are not expired yet.
+
+    Signed tokens are revoked until they expire. Opaque tokens are deleted
+    on revocation, they are only kept here until caches of other processes
+    drop them.
+
+    It mirrors `revoked_tokens` table, rows added by other processes are
+    picked up by `load`.
+    """
+
+    def __init__(self) -> None:
+        self._expirations: dict[str, float] = {}
+        self._last_id = 0
+
+    def __contains__(self, token_id: str) -> bool:
+        return token_id in self._expirations
+
+    def __len__(self) -> int:
+        return len(self._expirations)
+
+    async def load(self) -> None:
+        """Add revocations stored since the previous load."""
+        rows = await RevokedTokenTortoise.filter(
+            id__gt=self._last_id, expiration__gte=timezone.now()
+        ).order_by('id').values_list('id', 'token_id', 'expiration')
+        for id, token_id, expiration in rows:
+            self._expirations[token_id] = expiration.timestamp()
+            self._last_id = id
+
+    async def revoke(self, *tokens: Revocation) -> None:
+        """Store revocation of tokens and remember them."""
+        if not tokens:
+            return
+        for token in tokens:
+            self._expirations[token.token_id] = token.expiration.timestamp()
+        await RevokedTokenTortoise.bulk_create(
+            [RevokedTokenTortoise(token_id=token.token_id,
+                                  expiration=token.expiration)
+             for token in tokens],
+            ignore_conflicts=True
+        )
+
+    def prune(self) -> None:
+        """Forget revocations of expired tokens."""
+        now = timezone.now().timestamp()
+        self._expirations = {token_id: expiration for token_id, expiration
+                             in self._expirations.items() if expiration >= now}
+
+
+revoked_tokens = RevocationSet()
@@ -1,15 +1,112 @@
-from fastapi import Query
+import base64
+import binascii
+import json
+from typing import Any, AsyncIterator, NamedTuple, Sequence, TypeVar
+
+from fastapi import HTTPException, Query, Request, Response, status
 from tortoise.exceptions import NoValuesFetched
 from tortoise.fields.relational import ManyToManyRelation
+from tortoise.models import Model
+from tortoise.queryset import QuerySet
+
+MODEL = TypeVar('MODEL', bound=Model)
+
+
+class Pagination(NamedTuple):
+    skip: int
+    limit: int
+    after: dict[str, Any] | None = None
+
+
+def encode_cursor(id: int, **keys: Any) -> str:
+    """Return opaque cursor pointing after row with given id and keys."""
+    return base64.urlsafe_b64encode(
+        json.dumps({**keys, 'id': id}).encode()
+    ).decode()
+
+
+def decode_cursor(cursor: str) -> dict[str, Any]:
+    """Return keys encoded in cursor, 400 if cursor is malformed."""
+    try:
+        keys = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError):
+        keys = None
+    if not isinstance(keys, dict) or not isinstance(keys.get('id'), int):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail='Invalid cursor')
+    return keys
 
 
 async def pagination(
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=0),
-) -> tuple[int, int]:
+    cursor: str | None = Query(
+        None, description='Value of X-Next-Cursor header of previous page. '
+                          'Takes precedence over skip.'
+    ),
+) -> Pagination:
     """Handle pagination."""
     capped_limit = min(100, limit)
-    return (skip, capped_limit)
+    after = decode_cursor(cursor) if cursor is not None else None
+    return Pagination(skip, capped_limit, after)
+
+
+def paginate(queryset: QuerySet[MODEL],
+             pagination: Pagination) -> QuerySet[MODEL]:
+    """Apply keyset pagination if cursor given, offset one otherwise."""
+    queryset = queryset.order_by('id').limit(pagination.limit)
+    if pagination.after is not None:
+        return queryset.filter(id__gt=pagination.after['id'])
+    return queryset.offset(pagination.skip)
+
+
+def set_next_cursor(response: Response, page: Sequence,
+                    pagination: Pagination, *keys: str) -> None:
+    """Set X-Next-Cursor header if there may be next page.
+
+    Cursor points after last item of page by its id and given keys.
+    Items are models or rows.
+    """
+    if page and len(page) == pagination.limit:
+        last = page[-1]
+
+        def get(key: str) -> Any:
+            return last[key] if isinstance(last, dict) else getattr(last, key)
+
+        response.headers['X-Next-Cursor'] = encode_cursor(
+            get('id'), **{key: get(key) for key in keys}
+        )
+
+
+async def iter_json_items(request: Request) -> AsyncIterator[Any]:
+    """Yield items of JSON array body or raw lines of NDJSON body.
+
+    NDJSON body is consumed as it arrives, so its lines are yielded as
+    bytes for the caller to decode and validate one by one.
+    """
+    content_type = request.headers.get('content-type', '')
+    if content_type.startswith('application/x-ndjson'):
+        buffer = b''
+        async for data in request.stream():
+            *lines, buffer = (buffer + data).split(b'\n')
+            for line in lines:
+                if line.strip():
+                    yield line
+        if buffer.strip():
+            yield buffer
+        return
+
+    try:
+        items = json.loads(await request.body())
+    except ValueError:
+        items = None
+    if not isinstance(items, list):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail='Body must be JSON array or NDJSON'
+        )
+    for item in items:
+        yield item
 
 
 def get_list_from_relation(cls, val: ManyToManyRelation) -> list:
@@ -0,0 +1,58 @@
+"""Measure throughput of POST /cards/bulk on a file database.
+
+Run with `python -m benchmarks.bulk_import`.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('--cards', type=int, default=50000)
+parser.add_argument('--collections', type=int, default=3,
+                    help='collections every card is linked to')
+parser.add_argument('--format', choices=('json', 'ndjson'), default='ndjson')
+args = parser.parse_args()
+
+db_dir = tempfile.mkdtemp()
+os.environ['SQLITE_HOST'] = f'sqlite://{db_dir}/bench.sqlite3'
+
+from benchmarks.common import app_client, login  # noqa: E402
+
+
+async def main() -> None:
+    async with app_client() as client:
+        headers = await login(client, 'bulk@example.com')
+        collections = [
+            (await client.post('/collections/', headers=headers, json={
+                'title': f'deck {i}', 'description': 'bulk import'
+            })).json()
+            for i in range(args.collections)
+        ]
+        cards = [{'title': f'card {i}', 'content': 'content ' * 20,
+                  'collections': collections} for i in range(args.cards)]
+        if args.format == 'ndjson':
+            body = '\n'.join(json.dumps(card) for card in cards).encode()
+            headers['Content-Type'] = 'application/x-ndjson'
+        else:
+            body = json.dumps(cards).encode()
+            headers['Content-Type'] = 'application/json'
+
+        start = time.perf_counter()
+        response = await client.post('/cards/bulk', content=body,
+                                     headers=headers)
+        elapsed = time.perf_counter() - start
+
+    results = response.json()
+    print(json.dumps({
+        'cards': args.cards,
+        'created': sum(result['id'] is not None for result in results),
+        'seconds': round(elapsed, 2),
+        'cards_per_second': round(args.cards / elapsed),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
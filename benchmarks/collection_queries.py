@@ -0,0 +1,51 @@
+"""Compare query counts of collection loading as decks grow.
+
+Run with `python -m benchmarks.collection_queries`.
+"""
+import argparse
+
+from tortoise import Tortoise, run_async
+
+from benchmarks.common import count_queries, create_deck, init_db, timer
+
+from app.models.authentication import UserTortoise  # isort: skip
+from app.models.models import CollectionTortoise  # isort: skip
+from app.utils.loaders import load_collection  # isort: skip
+from app.utils.loaders import load_collection_row  # isort: skip
+
+
+async def load_per_card(collection: CollectionTortoise) -> None:
+    """Load collection the way routers did before batched loaders."""
+    await collection.fetch_related('cards')
+    for card in collection.cards:
+        await card.fetch_related('collections')
+
+
+async def main(sizes: list[int], per_card: bool) -> None:
+    await init_db()
+    owner = await UserTortoise.create(email='bench@example.com',
+                                      name='bench', hashed_password='-')
+    print(f'{"cards":>8} {"loader":>16} {"queries":>8} {"ms":>10}')
+    for size in sizes:
+        deck = await create_deck(owner, size)
+        loaders = [('batched', load_collection),
+                   ('batched rows', load_collection_row)]
+        if per_card:
+            loaders.append(('per-card', load_per_card))
+        for name, loader in loaders:
+            collection = await CollectionTortoise.get(id=deck.id)
+            with count_queries() as counter, timer() as elapsed:
+                await loader(collection)
+            print(f'{size:>8} {name:>16} {counter.count:>8} '
+                  f'{elapsed["ms"]:>10.1f}')
+    await Tortoise.close_connections()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10, 100, 1000, 10000])
+    parser.add_argument('--per-card', action='store_true',
+                        help='also measure the old per-card loading')
+    args = parser.parse_args()
+    run_async(main(args.sizes, args.per_card))
@@ -0,0 +1,138 @@
+import logging
+import os
+import statistics
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator
+
+import httpx
+from asgi_lifespan import LifespanManager
+
+os.environ.setdefault('SQLITE_HOST', 'sqlite://:memory:')
+# all clients of benchmarks share one address, limits would refuse them
+os.environ.setdefault('RATE_LIMIT_BACKEND', 'none')
+
+from tortoise import Tortoise, connections  # noqa: E402
+
+from app.main import TORTOISE_ORM, app  # noqa: E402
+from app.models.authentication import UserTortoise  # noqa: E402
+from app.models.models import CardTortoise, CollectionTortoise  # noqa: E402
+
+
+class QueryCounter(logging.Handler):
+    """Count SQL statements logged by tortoise database client."""
+
+    def __init__(self) -> None:
+        super().__init__(logging.DEBUG)
+        self.count = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.msg == '%s: %s':
+            self.count += 1
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryCounter]:
+    """Count queries issued inside the block."""
+    logger = logging.getLogger('tortoise.db_client')
+    counter = QueryCounter()
+    level = logger.level
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(counter)
+    try:
+        yield counter
+    finally:
+        logger.removeHandler(counter)
+        logger.setLevel(level)
+
+
+@contextmanager
+def timer() -> Iterator[dict]:
+    """Measure wall time of the block in milliseconds."""
+    result: dict = {}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result['ms'] = (time.perf_counter() - start) * 1000
+
+
+async def init_db(db_url: str = 'sqlite://:memory:') -> None:
+    """Initialize tortoise with application models and create schema."""
+    config = {**TORTOISE_ORM, 'connections': {'default': db_url}}
+    await Tortoise.init(config=config)
+    await Tortoise.generate_schemas()
+
+
+async def create_deck(owner: UserTortoise, size: int,
+                      is_private: bool = False) -> CollectionTortoise:
+    """Create collection with `size` cards, each also in a second one."""
+    collection = await CollectionTortoise.create(
+        title=f'deck of {size}', description='benchmark deck',
+        owner=owner, is_private=is_private
+    )
+    other = await CollectionTortoise.create(
+        title='other', description='benchmark deck', owner=owner
+    )
+    first_id = (await CardTortoise.all().order_by('-id').first()
+                .values_list('id', flat=True)) or 0
+    await CardTortoise.bulk_create(
+        [CardTortoise(title=f'card {i}', content='content ' * 20,
+                      owner=owner) for i in range(size)],
+        batch_size=1000
+    )
+    card_ids = await CardTortoise.filter(
+        id__gt=first_id
+    ).values_list('id', flat=True)
+    await connections.get('default').execute_many(
+        'INSERT INTO "collections_cards" '
+        '("collections_id", "cardtortoise_id") VALUES (?, ?)',
+        [[col.id, card_id] for card_id in card_ids
+         for col in (collection, other)]
+    )
+    return collection
+
+
+def summarize(latencies: list[float], elapsed: float) -> dict:
+    """Return throughput and latency percentiles in milliseconds."""
+    if not latencies:
+        return {'requests': 0}
+    # quantiles need at least two points
+    quantiles = statistics.quantiles(latencies * 2 if len(latencies) == 1
+                                     else latencies, n=100,
+                                     method='inclusive')
+    return {
+        'requests': len(latencies),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50': round(quantiles[49] * 1000, 2),
+        'p95': round(quantiles[94] * 1000, 2),
+        'p99': round(quantiles[98] * 1000, 2),
+        'max': round(max(latencies) * 1000, 2),
+    }
+
+
+@asynccontextmanager
+async def app_client() -> AsyncIterator[httpx.AsyncClient]:
+    """Run application lifespan and yield in-process client."""
+    async with LifespanManager(app):
+        async with httpx.AsyncClient(app=app, base_url='http://bench',
+                                     timeout=None) as client:
+            yield client
+
+
+async def login(client: httpx.AsyncClient, email: str,
+                password: str = 'password') -> dict:
+    """Register user if needed and return authorization header."""
+    await client.post('/register', json={'email': email, 'name': email,
+                                         'password': password})
+    return get_authorization(await client.post('/token', data={
+        'username': email, 'password': password
+    }))
+
+
+def get_authorization(response: httpx.Response) -> dict:
+    """Return authorization header from response of `/token`."""
+    if response.status_code != 200:
+        raise RuntimeError(f'login failed with {response.status_code}: '
+                           f'{response.text}')
+    return {'Authorization': f'Bearer {response.json()["access_token"]}'}
@@ -0,0 +1,102 @@
+"""Measure compression of collection responses as decks grow.
+
+Run with `python -m benchmarks.compression`. For every encoding prints
+size of compressed body, time to compress it and the longest stall of
+event loop while the body is sent through compression middleware with
+compression on the loop and in a thread.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from starlette.types import Message
+from tortoise import Tortoise, run_async
+
+from benchmarks.common import create_deck, init_db, timer
+
+from app.models.authentication import UserTortoise  # isort: skip
+from app.models.models import CollectionTortoise  # isort: skip
+from app.utils.compression import ENCODINGS  # isort: skip
+from app.utils.compression import CompressionResponder  # isort: skip
+from app.utils.loaders import load_collection_row  # isort: skip
+from app.utils.serialization import dumps  # isort: skip
+
+
+async def send_compressed(body: bytes, encoding: str,
+                          thread_size: float) -> bytes:
+    """Send body through compression, return compressed body."""
+    chunks = []
+
+    async def send(message: Message) -> None:
+        if message['type'] == 'http.response.body':
+            chunks.append(message['body'])
+
+    responder = CompressionResponder(send, encoding, minimum_size=0,
+                                     thread_size=thread_size)
+    await responder.send({'type': 'http.response.start', 'status': 200,
+                          'headers': [(b'content-type',
+                                       b'application/json')]})
+    await responder.send({'type': 'http.response.body', 'body': body})
+    return b''.join(chunks)
+
+
+async def get_max_stall(body: bytes, encoding: str,
+                        thread_size: float) -> float:
+    """Return the longest gap in ms between ticks of a concurrent task."""
+    stalls = []
+    done = False
+
+    async def ticker() -> None:
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(0)
+            now = time.perf_counter()
+            stalls.append(now - last)
+            last = now
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    await send_compressed(body, encoding, thread_size)
+    done = True
+    await task
+    return max(stalls) * 1000
+
+
+async def main(sizes: list[int], repeat: int, thread_size: int) -> None:
+    await init_db()
+    owner = await UserTortoise.create(email='bench@example.com',
+                                      name='bench', hashed_password='-')
+    print(f'{"cards":>8} {"encoding":>9} {"kb":>8} {"ratio":>6} '
+          f'{"p50 ms":>8} {"stall loop":>11} {"stall thread":>13}')
+    for size in sizes:
+        deck = await create_deck(owner, size)
+        collection = await CollectionTortoise.get(id=deck.id)
+        body = dumps(await load_collection_row(collection))
+        print(f'{size:>8} {"identity":>9} {len(body) / 1024:>8.0f}')
+        for encoding in ENCODINGS:
+            durations = []
+            for _ in range(repeat):
+                with timer() as elapsed:
+                    compressed = await send_compressed(body, encoding,
+                                                       float('inf'))
+                durations.append(elapsed['ms'])
+            compressed_size = len(compressed)
+            stall_loop = await get_max_stall(body, encoding, float('inf'))
+            stall_thread = await get_max_stall(body, encoding, thread_size)
+            print(f'{size:>8} {encoding:>9} {compressed_size / 1024:>8.0f} '
+                  f'{len(body) / compressed_size:>6.1f} '
+                  f'{statistics.median(durations):>8.1f} '
+                  f'{stall_loop:>11.1f} {stall_thread:>13.1f}')
+    await Tortoise.close_connections()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[100, 1000, 5000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--thread-size', type=int, default=262144,
+                        help='bytes from which bodies compress in a thread')
+    args = parser.parse_args()
+    run_async(main(args.sizes, args.repeat, args.thread_size))
@@ -0,0 +1,283 @@
+"""Drive every endpoint against a seeded database and report latencies.
+
+Seed the database with `python -m benchmarks.seed` first, then run
+`python -m benchmarks.load --db bench.sqlite3 --output run.json`. Requests
+are picked by weight of their endpoint, per endpoint throughput and
+p50/p95/p99 latency are written as JSON to compare runs over time.
+
+The database is copied before the run, so every run starts from the same
+state, unless `--in-place` is given. Settings of the application are read
+from environment as usual.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, NamedTuple
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('--db', default='bench.sqlite3',
+                    help='database seeded by benchmarks.seed')
+parser.add_argument('--duration', type=float, default=30)
+parser.add_argument('--concurrency', type=int, default=32,
+                    help='concurrent clients, each logged in as own user')
+parser.add_argument('--endpoints', nargs='+',
+                    help='run only these endpoints, e.g. "GET /cards/"')
+parser.add_argument('--output', help='file to write results to')
+parser.add_argument('--in-place', action='store_true',
+                    help='run against the seeded file instead of its copy')
+parser.add_argument('--seed', type=int, default=0)
+args = parser.parse_args()
+
+if not os.path.exists(args.db):
+    raise SystemExit(f'{args.db} does not exist, seed it first')
+db_path = args.db
+if not args.in_place:
+    db_path = os.path.join(tempfile.mkdtemp(), 'load.sqlite3')
+    shutil.copyfile(args.db, db_path)
+os.environ['SQLITE_HOST'] = f'sqlite://{db_path}'
+
+import httpx  # noqa: E402
+
+from benchmarks.common import (app_client, get_authorization,  # noqa: E402
+                               summarize)
+from benchmarks.seed import PASSWORD, get_vocabulary  # noqa: E402
+
+
+class Client(NamedTuple):
+    """State of one simulated user."""
+    headers: dict
+    cards: list[int]
+    collections: list[int]
+    created_cards: list[int]
+    created_collections: list[int]
+    tokens: list[str]
+
+
+class Endpoint(NamedTuple):
+    weight: float
+    # returns request arguments, None if client cannot make request now
+    request: Callable[[Client, random.Random], dict | None]
+    # records objects created by request
+    record: Callable[[Client, httpx.Response], None] | None = None
+
+
+def pop(items: list[int], count: int = 1) -> list[int]:
+    popped = items[-count:]
+    del items[-count:]
+    return popped
+
+
+def new_card(client: Client, rng: random.Random) -> dict:
+    return {'title': f'load card {rng.random()}',
+            'content': ' '.join(rng.choices(vocabulary, k=20)),
+            'collections': [{'id': rng.choice(client.collections),
+                             'title': '', 'description': ''}]}
+
+
+# logs in and out, apart from clients whose tokens must stay valid
+LOGIN_EMAIL = 'load-login@example.com'
+
+vocabulary = get_vocabulary(5000)[:200]
+public_collections: list[int] = []
+
+ENDPOINTS: dict[str, Endpoint] = {
+    'POST /register': Endpoint(0.2, lambda c, rng: {
+        'url': '/register', 'json': {
+            'email': f'load{rng.random()}@example.com', 'name': 'load',
+            'password': PASSWORD,
+        },
+    }),
+    'POST /token': Endpoint(0.5, lambda c, rng: {
+        'url': '/token', 'data': {'username': LOGIN_EMAIL,
+                                  'password': PASSWORD},
+    }, lambda c, response: c.tokens.append(response.json()['access_token'])),
+    'POST /logout': Endpoint(0.5, lambda c, rng: {
+        'url': '/logout',
+        'headers': {'Authorization': f'Bearer {c.tokens.pop()}'},
+    } if c.tokens else None),
+    'GET /cards/': Endpoint(10, lambda c, rng: {
+        'url': '/cards/', 'params': {'skip': rng.randrange(100)},
+    }),
+    'GET /cards/{id}': Endpoint(10, lambda c, rng: {
+        'url': f'/cards/{rng.choice(c.cards)}',
+    }),
+    'GET /cards/search': Endpoint(5, lambda c, rng: {
+        'url': '/cards/search', 'params': {
+            'q': rng.choice(vocabulary), 'include_public': rng.random() < 0.5,
+        },
+    }),
+    'POST /cards/': Endpoint(3, lambda c, rng: {
+        'url': '/cards/', 'json': new_card(c, rng),
+    }, lambda c, response: c.created_cards.append(response.json()['id'])),
+    'POST /cards/bulk': Endpoint(0.5, lambda c, rng: {
+        'url': '/cards/bulk', 'json': [new_card(c, rng) for _ in range(50)],
+    }, lambda c, response: c.created_cards.extend(
+        item['id'] for item in response.json()
+    )),
+    'PUT /cards/{id}': Endpoint(3, lambda c, rng: {
+        'url': f'/cards/{rng.choice(c.cards)}',
+        'json': {'title': f'updated {rng.random()}'},
+    }),
+    'DELETE /cards/{id}': Endpoint(1, lambda c, rng: {
+        'url': f'/cards/{pop(c.created_cards)[0]}',
+    } if c.created_cards else None),
+    'DELETE /cards/': Endpoint(0.5, lambda c, rng: {
+        'url': '/cards/', 'params': {'id': pop(c.created_cards, 10)},
+    } if c.created_cards else None),
+    'GET /collections/public': Endpoint(5, lambda c, rng: {
+        'url': '/collections/public', 'params': {'skip': rng.randrange(100)},
+    }),
+    'GET /collections/public/{id}': Endpoint(10, lambda c, rng: {
+        'url': f'/collections/public/{rng.choice(public_collections)}',
+    }),
+    'GET /collections/private': Endpoint(3, lambda c, rng: {
+        'url': '/collections/private',
+    }),
+    'GET /collections/private/{id}': Endpoint(5, lambda c, rng: {
+        'url': f'/collections/private/{rng.choice(c.collections)}',
+    }),
+    'GET /collections/public/{id}/export': Endpoint(0.5, lambda c, rng: {
+        'url': f'/collections/public/{rng.choice(public_collections)}/export',
+    }),
+    'GET /collections/private/{id}/export': Endpoint(0.5, lambda c, rng: {
+        'url': f'/collections/private/{rng.choice(c.collections)}/export',
+        'params': {'format': 'csv'},
+    }),
+    'POST /collections/': Endpoint(1, lambda c, rng: {
+        'url': '/collections/', 'json': {'title': 'load collection',
+                                         'description': 'load'},
+    }, lambda c, response: c.created_collections.append(
+        response.json()['id']
+    )),
+    'PUT /collections/{id}': Endpoint(1, lambda c, rng: {
+        'url': f'/collections/{rng.choice(c.collections)}',
+        'json': {'description': f'updated {rng.random()}'},
+    }),
+    'DELETE /collections/{id}': Endpoint(0.5, lambda c, rng: {
+        'url': f'/collections/{pop(c.created_collections)[0]}',
+    } if c.created_collections else None),
+}
+
+
+def load_clients_data(count: int) -> list[tuple[int, list[int], list[int]]]:
+    """Return ids of users with cards and collections, and their objects."""
+    db = sqlite3.connect(db_path)
+    public_collections.extend(row[0] for row in db.execute(
+        'SELECT "id" FROM "collections" WHERE NOT "is_private"'
+    ))
+    users = [row[0] for row in db.execute(
+        'SELECT "owner_id" FROM "cards" GROUP BY "owner_id" '
+        'ORDER BY COUNT(*) DESC LIMIT ?', [count]
+    )]
+    data = []
+    for user_id in users:
+        cards = [row[0] for row in db.execute(
+            'SELECT "id" FROM "cards" WHERE "owner_id" = ? LIMIT 1000',
+            [user_id]
+        )]
+        collections = [row[0] for row in db.execute(
+            'SELECT "id" FROM "collections" WHERE "owner_id" = ?', [user_id]
+        )]
+        if collections:
+            data.append((user_id, cards, collections))
+    db.close()
+    return data
+
+
+async def login(http: httpx.AsyncClient, user_id: int) -> dict:
+    email, = sqlite3.connect(db_path).execute(
+        'SELECT "email" FROM "users" WHERE "id" = ?', [user_id]
+    ).fetchone()
+    return get_authorization(await http.post('/token', data={
+        'username': email, 'password': PASSWORD
+    }))
+
+
+async def worker(http: httpx.AsyncClient, client: Client,
+                 endpoints: dict[str, Endpoint], rng: random.Random,
+                 deadline: float, results: dict) -> None:
+    names = list(endpoints)
+    weights = [endpoint.weight for endpoint in endpoints.values()]
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        endpoint = endpoints[name]
+        request = endpoint.request(client, rng)
+        if request is None:
+            continue
+        method, _ = name.split(' ', 1)
+        request = {'method': method, **request,
+                   'headers': request.get('headers', client.headers)}
+        start = time.perf_counter()
+        response = await http.request(**request)
+        latency = time.perf_counter() - start
+        latencies, statuses = results.setdefault(name, ([], {}))
+        latencies.append(latency)
+        statuses[response.status_code] = (
+            statuses.get(response.status_code, 0) + 1
+        )
+        if endpoint.record is not None and response.is_success:
+            endpoint.record(client, response)
+
+
+def get_commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'],
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main() -> None:
+    endpoints = ENDPOINTS if not args.endpoints else {
+        name: ENDPOINTS[name] for name in args.endpoints
+    }
+    clients_data = load_clients_data(args.concurrency)
+    rng = random.Random(args.seed)
+    results: dict = {}
+    async with app_client() as http:
+        await http.post('/register', json={'email': LOGIN_EMAIL,
+                                           'name': 'load',
+                                           'password': PASSWORD})
+        clients = [
+            Client(await login(http, user_id), cards, collections, [], [], [])
+            for user_id, cards, collections in clients_data
+        ]
+        started = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*(
+            worker(http, client, endpoints, random.Random(rng.random()),
+                   deadline, results)
+            for client in clients
+        ))
+        elapsed = time.perf_counter() - start
+
+    report = {
+        'started': started.isoformat(),
+        'commit': get_commit(),
+        'args': vars(args),
+        'total': summarize([latency for latencies, _ in results.values()
+                            for latency in latencies], elapsed),
+        'endpoints': {
+            name: {**summarize(latencies, elapsed), 'statuses': statuses}
+            for name, (latencies, statuses) in sorted(results.items())
+        },
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output)
+    print(output)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
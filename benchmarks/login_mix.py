@@ -0,0 +1,77 @@
+"""Measure card reads latency while logins hash passwords.
+
+Run with `python -m benchmarks.login_mix`. Pass `--inline` to hash on the
+event loop as before the hashing pool, for comparison.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from benchmarks.common import app_client, login, summarize
+
+from app.utils import passwords  # isort: skip
+
+
+async def worker(client: httpx.AsyncClient, request: dict,
+                 deadline: float, latencies: list[float],
+                 statuses: dict[int, int]) -> None:
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.request(**request)
+        latencies.append(time.perf_counter() - start)
+        statuses[response.status_code] = (
+            statuses.get(response.status_code, 0) + 1
+        )
+
+
+async def main(duration: float, logins: int, readers: int,
+               inline: bool) -> None:
+    if inline:
+        async def run_inline(func, *args):
+            return func(*args)
+        passwords.hashing_pool.run = run_inline  # type: ignore
+
+    async with app_client() as client:
+        headers = await login(client, 'reader@example.com')
+        for i in range(20):
+            await client.post('/cards/', headers=headers, json={
+                'title': f'card {i}', 'content': 'content'
+            })
+        await login(client, 'login@example.com')
+
+        login_request = {'method': 'POST', 'url': '/token', 'data': {
+            'username': 'login@example.com', 'password': 'password'
+        }}
+        read_request = {'method': 'GET', 'url': '/cards/',
+                        'headers': headers}
+        results: dict = {}
+        start = time.perf_counter()
+        deadline = start + duration
+        tasks = []
+        for name, request, count in (('login', login_request, logins),
+                                     ('read', read_request, readers)):
+            results[name] = ([], {})
+            tasks += [worker(client, request, deadline, *results[name])
+                      for _ in range(count)]
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        name: {**summarize(latencies, elapsed), 'statuses': statuses}
+        for name, (latencies, statuses) in results.items()
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--logins', type=int, default=16,
+                        help='concurrent login clients')
+    parser.add_argument('--readers', type=int, default=16,
+                        help='concurrent card read clients')
+    parser.add_argument('--inline', action='store_true')
+    args = parser.parse_args()
+    asyncio.run(main(args.duration, args.logins, args.readers, args.inline))
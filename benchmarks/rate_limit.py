@@ -0,0 +1,114 @@
+"""Measure CPU spent on a password guessing attack with and without limits.
+
+Run with `python -m benchmarks.rate_limit --backend none` and compare with
+the default `--backend memory`. Attackers post wrong passwords from their
+own addresses at a steady rate while a regular client reads cards.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('--backend', default='memory',
+                    choices=['memory', 'sqlite', 'none'])
+parser.add_argument('--duration', type=float, default=10)
+parser.add_argument('--attackers', type=int, default=8,
+                    help='addresses guessing passwords concurrently')
+parser.add_argument('--emails', type=int, default=1,
+                    help='emails attacked, 1 targets a single account')
+parser.add_argument('--rate', type=float, default=10,
+                    help='attempts a second of every attacker')
+args = parser.parse_args()
+
+os.environ['RATE_LIMIT_BACKEND'] = args.backend
+if args.backend == 'sqlite':
+    import tempfile
+    os.environ['RATE_LIMIT_PATH'] = os.path.join(tempfile.mkdtemp(),
+                                                 'buckets.sqlite3')
+
+import httpx  # noqa: E402
+
+from benchmarks.common import app, app_client, login, summarize  # noqa: E402
+
+from app.models.authentication import UserTortoise  # noqa: E402 isort: skip
+from app.utils import passwords  # noqa: E402 isort: skip
+
+
+async def attacker(index: int, deadline: float, statuses: dict) -> None:
+    transport = httpx.ASGITransport(app=app,
+                                    client=(f'10.0.0.{index + 1}', 1234))
+    async with httpx.AsyncClient(transport=transport,
+                                 base_url='http://bench') as client:
+        attempt = 0
+        while time.perf_counter() < deadline:
+            attempt += 1
+            response = await client.post('/token', data={
+                'username': f'victim{attempt % args.emails}@example.com',
+                'password': f'guess{attempt}',
+            })
+            statuses[response.status_code] = (
+                statuses.get(response.status_code, 0) + 1
+            )
+            await asyncio.sleep(1 / args.rate)
+
+
+async def reader(client: httpx.AsyncClient, headers: dict,
+                 deadline: float, latencies: list[float]) -> None:
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.get('/cards/', headers=headers)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+
+async def main() -> None:
+    verifications = 0
+    verification_cpu = 0.0
+    verify_password = passwords.verify_password
+
+    def count_verifications(*args):
+        # runs in hashing thread, so thread time is CPU spent on bcrypt
+        nonlocal verifications, verification_cpu
+        start = time.thread_time()
+        try:
+            return verify_password(*args)
+        finally:
+            verifications += 1
+            verification_cpu += time.thread_time() - start
+
+    async with app_client() as client:
+        headers = await login(client, 'reader@example.com')
+        # created directly, as registration is rate limited as well
+        hashed_password = passwords.get_password_hash('password')
+        await UserTortoise.bulk_create([
+            UserTortoise(email=f'victim{i}@example.com', name='victim',
+                         hashed_password=hashed_password)
+            for i in range(args.emails)
+        ])
+        passwords.verify_password = count_verifications  # type: ignore
+        statuses: dict[int, int] = {}
+        latencies: list[float] = []
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(
+            reader(client, headers, deadline, latencies),
+            *(attacker(i, deadline, statuses)
+              for i in range(args.attackers))
+        )
+        elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        'backend': args.backend,
+        'attempts': sum(statuses.values()),
+        'statuses': statuses,
+        'password_checks': verifications,
+        'password_cpu_seconds': round(verification_cpu, 2),
+        'password_cpu_share': round(verification_cpu / elapsed, 3),
+        'reads': summarize(latencies, elapsed),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
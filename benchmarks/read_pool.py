@@ -0,0 +1,75 @@
+"""Measure read and write latency with and without reader connections.
+
+Run with `python -m benchmarks.read_pool --readers 0` and compare with the
+default pool size, e.g. `--readers 4`.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('--readers', type=int, default=4,
+                    help='reader connections, 0 keeps single connection')
+parser.add_argument('--duration', type=float, default=10)
+parser.add_argument('--cards', type=int, default=20000,
+                    help='cards read pages are skipping over')
+parser.add_argument('--read-clients', type=int, default=32)
+parser.add_argument('--write-clients', type=int, default=4)
+args = parser.parse_args()
+
+db_dir = tempfile.mkdtemp()
+os.environ['SQLITE_HOST'] = f'sqlite://{db_dir}/bench.sqlite3'
+os.environ['SQLITE_READERS'] = str(args.readers)
+
+from benchmarks.common import app_client, login, summarize  # noqa: E402
+
+
+async def worker(client, request: dict, deadline: float,
+                 latencies: list[float]) -> None:
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.request(**request)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+
+async def main() -> None:
+    async with app_client() as client:
+        headers = await login(client, 'pool@example.com')
+        collection = (await client.post('/collections/', headers=headers,
+                                        json={'title': 'deck',
+                                              'description': 'read pool'}
+                                        )).json()
+        await client.post('/cards/bulk', headers=headers, json=[
+            {'title': f'card {i}', 'content': 'content ' * 20,
+             'collections': [collection]} for i in range(args.cards)
+        ])
+        requests = {
+            'read': {'method': 'GET', 'url': '/cards/', 'headers': headers,
+                     'params': {'limit': 10, 'skip': args.cards - 100}},
+            'write': {'method': 'POST', 'url': '/cards/', 'headers': headers,
+                      'json': {'title': 'card', 'content': 'content',
+                               'collections': [collection]}},
+        }
+        results: dict[str, list[float]] = {'read': [], 'write': []}
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*(
+            worker(client, requests[name], deadline, results[name])
+            for name, count in (('read', args.read_clients),
+                                ('write', args.write_clients))
+            for _ in range(count)
+        ))
+        elapsed = time.perf_counter() - start
+
+    print(json.dumps({'readers': args.readers, **{
+        name: summarize(latencies, elapsed)
+        for name, latencies in results.items()
+    }}, indent=2))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
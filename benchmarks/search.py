@@ -0,0 +1,87 @@
+"""Measure full-text search latency on a large card corpus.
+
+Run with `python -m benchmarks.search`. The corpus is generated once into
+`--db` file and reused by later runs.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import time
+
+from tortoise import Tortoise
+
+from benchmarks.common import init_db, summarize
+
+from app.utils.search import create_search_index, search_cards  # isort: skip
+from app.utils.utils import Pagination  # isort: skip
+
+QUERIES = ('w1', 'w10 w20', 'w100', 'w1000', 'w4999', 'w3', 'w12 w7', 'w50')
+
+
+def seed(path: str, cards: int, owners: int, words: int) -> None:
+    """Insert cards with zipf distributed words, triggers index them."""
+    rng = random.Random(0)
+    vocabulary = [f'w{i}' for i in range(words)]
+    weights = [1 / (i + 1) for i in range(words)]
+    db = sqlite3.connect(path)
+    db.execute('PRAGMA synchronous=OFF')
+    db.executemany('INSERT INTO "users" ("email", "name", "hashed_password") '
+                   'VALUES (?, ?, ?)',
+                   [(f'user{i}@example.com', f'user{i}', '-')
+                    for i in range(owners)])
+    batch = 10000
+    for start in range(0, cards, batch):
+        rows = []
+        for i in range(start, min(start + batch, cards)):
+            text = rng.choices(vocabulary, weights, k=40)
+            rows.append((' '.join(text[:5]), ' '.join(text[5:]),
+                         rng.randrange(owners) + 1))
+        db.executemany(
+            'INSERT INTO "cards" ("title", "content", "owner_id", '
+            '"creation", "last_update") VALUES (?, ?, ?, '
+            'CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)', rows
+        )
+        db.commit()
+    db.close()
+
+
+async def main(args: argparse.Namespace) -> None:
+    exists = os.path.exists(args.db)
+    await init_db(f'sqlite://{args.db}')
+    await create_search_index()
+    if not exists:
+        start = time.perf_counter()
+        seed(args.db, args.cards, args.owners, args.words)
+        print(f'seeded {args.cards} cards in '
+              f'{time.perf_counter() - start:.1f}s')
+
+    results = {}
+    for query in QUERIES:
+        for include_public in (False, True):
+            latencies = []
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                owner_id = random.randrange(args.owners) + 1
+                began = time.perf_counter()
+                await search_cards(query, owner_id, include_public,
+                                   Pagination(0, 10))
+                latencies.append(time.perf_counter() - began)
+            scope = 'public' if include_public else 'own'
+            results[f'{query} ({scope})'] = summarize(
+                latencies, time.perf_counter() - start
+            )
+    await Tortoise.close_connections()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--db', default='search_bench.sqlite3')
+    parser.add_argument('--cards', type=int, default=1_000_000)
+    parser.add_argument('--owners', type=int, default=1000)
+    parser.add_argument('--words', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
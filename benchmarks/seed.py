@@ -0,0 +1,123 @@
+"""Seed a database file with synthetic users, cards and collections.
+
+Run with `python -m benchmarks.seed --db bench.sqlite3`. Defaults give
+1M cards in 100k collections. Card owners and collections of cards follow
+zipf distributions, so a few users and collections hold most of cards.
+Every user has password `password`.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import sqlite3
+import time
+
+from tortoise import Tortoise, timezone
+
+from benchmarks.common import init_db
+
+from app.utils.passwords import get_password_hash  # isort: skip
+from app.utils.search import create_search_index  # isort: skip
+
+PASSWORD = 'password'
+BATCH = 10000
+
+
+def zipf_weights(count: int, skew: float) -> list[float]:
+    """Return cumulative weights of ranks 1..count."""
+    return list(itertools.accumulate(1 / (rank + 1) ** skew
+                                     for rank in range(count)))
+
+
+def get_vocabulary(words: int) -> list[str]:
+    return [f'w{i}' for i in range(words)]
+
+
+def seed(path: str, users: int, cards: int, collections: int,
+         skew: float, public_share: float, words: int,
+         rng: random.Random) -> None:
+    """Insert rows with executemany, search index is rebuilt afterwards."""
+    db = sqlite3.connect(path)
+    db.execute('PRAGMA synchronous=OFF')
+    db.execute('PRAGMA journal_mode=WAL')
+    now = timezone.now().isoformat(' ')
+    hashed_password = get_password_hash(PASSWORD)
+    db.executemany(
+        'INSERT INTO "users" ("email", "name", "hashed_password") '
+        'VALUES (?, ?, ?)',
+        [(f'user{i}@example.com', f'user{i}', hashed_password)
+         for i in range(users)]
+    )
+    # collection i belongs to user i % users, so ids of collections of
+    # user are owner_id, owner_id + users and so on
+    db.executemany(
+        'INSERT INTO "collections" ("title", "description", "is_private", '
+        '"last_update", "owner_id") VALUES (?, ?, ?, ?, ?)',
+        [(f'collection {i}', 'synthetic collection',
+          rng.random() >= public_share, now, i % users + 1)
+         for i in range(collections)]
+    )
+
+    vocabulary = get_vocabulary(words)
+    word_weights = zipf_weights(words, 1.0)
+    owner_weights = zipf_weights(users, skew)
+    collection_weights = zipf_weights(-(-collections // users), skew)
+    card_id = 0
+    for start in range(0, cards, BATCH):
+        rows = []
+        links = []
+        owners = rng.choices(range(1, users + 1), cum_weights=owner_weights,
+                             k=min(BATCH, cards - start))
+        for owner_id in owners:
+            card_id += 1
+            text = rng.choices(vocabulary, cum_weights=word_weights, k=30)
+            rows.append((' '.join(text[:5]), ' '.join(text[5:]), now, now,
+                         owner_id))
+            owned = len(range(owner_id, collections + 1, users))
+            ranks = set(rng.choices(range(owned),
+                                    cum_weights=collection_weights[:owned],
+                                    k=rng.choice((0, 1, 1, 2, 3))))
+            links += [(owner_id + rank * users, card_id) for rank in ranks]
+        db.executemany(
+            'INSERT INTO "cards" ("title", "content", "creation", '
+            '"last_update", "owner_id") VALUES (?, ?, ?, ?, ?)', rows
+        )
+        db.executemany(
+            'INSERT INTO "collections_cards" '
+            '("collections_id", "cardtortoise_id") VALUES (?, ?)', links
+        )
+        db.commit()
+    db.execute('INSERT INTO "cards_fts" ("cards_fts") VALUES (\'rebuild\')')
+    db.commit()
+    db.execute('ANALYZE')
+    db.close()
+
+
+async def main(args: argparse.Namespace) -> None:
+    if os.path.exists(args.db):
+        raise SystemExit(f'{args.db} exists, remove it to seed again')
+    start = time.perf_counter()
+    await init_db(f'sqlite://{args.db}')
+    await create_search_index()
+    await Tortoise.close_connections()
+    seed(args.db, args.users, args.cards, args.collections, args.skew,
+         args.public_share, args.words, random.Random(args.seed))
+    print(f'seeded {args.users} users, {args.cards} cards and '
+          f'{args.collections} collections into {args.db} in '
+          f'{time.perf_counter() - start:.1f}s')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--db', default='bench.sqlite3')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--cards', type=int, default=1_000_000)
+    parser.add_argument('--collections', type=int, default=100_000)
+    parser.add_argument('--skew', type=float, default=1.1,
+                        help='zipf exponent of owners and collections')
+    parser.add_argument('--public-share', type=float, default=0.3,
+                        help='share of public collections')
+    parser.add_argument('--words', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
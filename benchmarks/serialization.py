@@ -0,0 +1,63 @@
+"""Compare model and fast serialization of collections as decks grow.
+
+Run with `python -m benchmarks.serialization`. The models path builds
+response models and validates them again the way the response model of
+a route does, the fast path encodes plain rows.
+"""
+import argparse
+import statistics
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from tortoise import Tortoise, run_async
+
+from benchmarks.common import create_deck, init_db, timer
+
+from app.models.authentication import UserTortoise  # isort: skip
+from app.models.models import CollectionDBLong  # isort: skip
+from app.models.models import CollectionTortoise  # isort: skip
+from app.utils.loaders import load_collection  # isort: skip
+from app.utils.loaders import load_collection_row  # isort: skip
+from app.utils.serialization import dumps, orjson  # isort: skip
+
+
+async def render_models(collection: CollectionTortoise) -> bytes:
+    model = await load_collection(collection)
+    # response model validates returned model once more
+    content = CollectionDBLong(**model.dict())
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+async def render_rows(collection: CollectionTortoise) -> bytes:
+    return dumps(await load_collection_row(collection))
+
+
+async def main(sizes: list[int], repeat: int) -> None:
+    await init_db()
+    owner = await UserTortoise.create(email='bench@example.com',
+                                      name='bench', hashed_password='-')
+    encoder = 'orjson' if orjson is not None else 'json'
+    print(f'{"cards":>8} {"path":>12} {"p50 ms":>10} {"kb":>8}')
+    for size in sizes:
+        deck = await create_deck(owner, size)
+        collection = await CollectionTortoise.get(id=deck.id)
+        for name, render in (('models', render_models),
+                             (f'fast/{encoder}', render_rows)):
+            durations = []
+            for _ in range(repeat):
+                with timer() as elapsed:
+                    body = await render(collection)
+                durations.append(elapsed['ms'])
+            print(f'{size:>8} {name:>12} '
+                  f'{statistics.median(durations):>10.1f} '
+                  f'{len(body) / 1024:>8.0f}')
+    await Tortoise.close_connections()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[100, 1000, 5000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    run_async(main(args.sizes, args.repeat))
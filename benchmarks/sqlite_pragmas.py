@@ -0,0 +1,111 @@
+"""Compare SQLite pragma profiles on write-heavy and mixed workloads.
+
+Run with `python -m benchmarks.sqlite_pragmas`. Every worker is a separate
+process with its own connection to a shared database file, so readers and
+writers contend for the file the same way several server workers do.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+PROFILES: dict[str, dict[str, str]] = {
+    'rollback': {
+        'SQLITE_JOURNAL_MODE': 'DELETE',
+        'SQLITE_SYNCHRONOUS': 'FULL',
+        'SQLITE_CACHE_SIZE': '-2000',
+        'SQLITE_MMAP_SIZE': '0',
+        'SQLITE_TEMP_STORE': 'DEFAULT',
+    },
+    'wal': {},
+}
+
+SCENARIOS = {
+    'write-heavy': {'write': 4, 'read': 0},
+    'mixed': {'write': 1, 'read': 4},
+}
+
+
+async def setup() -> dict:
+    from benchmarks.common import app_client, login
+
+    async with app_client() as client:
+        headers = await login(client, 'bench@example.com')
+        for i in range(200):
+            await client.post('/cards/', headers=headers, json={
+                'title': f'card {i}', 'content': 'content ' * 20
+            })
+    return headers
+
+
+async def work(role: str, headers: dict, duration: float) -> list[float]:
+    from benchmarks.common import app_client
+
+    request: dict = {
+        'write': {'method': 'POST', 'url': '/cards/',
+                  'json': {'title': 'card', 'content': 'content ' * 20}},
+        'read': {'method': 'GET', 'url': '/cards/',
+                 'params': {'limit': 50}},
+    }[role]
+    latencies: list[float] = []
+    async with app_client() as client:
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await client.request(**request, headers=headers)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def run(func, *args):
+    return asyncio.run(func(*args))
+
+
+def run_profile(profile: dict, duration: float) -> dict:
+    from benchmarks.common import summarize
+
+    results = {}
+    for scenario, workers in SCENARIOS.items():
+        with tempfile.TemporaryDirectory() as directory:
+            os.environ['SQLITE_HOST'] = (
+                f'sqlite://{os.path.join(directory, "bench.db")}'
+            )
+            os.environ.update(profile)
+            # workers read configuration from environment when spawned
+            with ProcessPoolExecutor(
+                sum(workers.values()), mp_context=get_context('spawn')
+            ) as executor:
+                headers = executor.submit(run, setup).result()
+                start = time.perf_counter()
+                futures = {role: [executor.submit(run, work, role, headers,
+                                                  duration)
+                                  for _ in range(count)]
+                           for role, count in workers.items()}
+                latencies: dict[str, list[float]] = {
+                    role: sum((f.result() for f in role_futures), [])
+                    for role, role_futures in futures.items()
+                }
+                elapsed = time.perf_counter() - start
+            for key in profile:
+                del os.environ[key]
+        results[scenario] = {role: summarize(role_latencies, elapsed)
+                             for role, role_latencies in latencies.items()
+                             if workers[role]}
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--profile', choices=PROFILES, action='append',
+                        help='profiles to run, all by default')
+    args = parser.parse_args()
+    print(json.dumps({
+        name: run_profile(PROFILES[name], args.duration)
+        for name in args.profile or PROFILES
+    }, indent=2))
@@ -0,0 +1,31 @@
+-- upgrade --
+CREATE TABLE "collections_cards_new" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "cardtortoise_id" INT NOT NULL REFERENCES "cards" ("id") ON DELETE CASCADE,
+    "collections_id" INT NOT NULL REFERENCES "collections" ("id") ON DELETE CASCADE,
+    CONSTRAINT "uid_collections_collect_396b73" UNIQUE ("collections_id", "cardtortoise_id")
+) /* ORM model of through table of collections and cards. */;
+INSERT INTO "collections_cards_new" ("collections_id", "cardtortoise_id")
+    SELECT DISTINCT "collections_id", "cardtortoise_id" FROM "collections_cards";
+DROP TABLE "collections_cards";
+ALTER TABLE "collections_cards_new" RENAME TO "collections_cards";
+CREATE INDEX IF NOT EXISTS "idx_collections_cardtor_eef816" ON "collections_cards" ("cardtortoise_id", "collections_id");
+CREATE INDEX IF NOT EXISTS "idx_cards_owner_i_fae56e" ON "cards" ("owner_id", "id");
+CREATE INDEX IF NOT EXISTS "idx_collections_owner_i_8415a6" ON "collections" ("owner_id", "id");
+CREATE INDEX IF NOT EXISTS "idx_collections_is_priv_e950d3" ON "collections" ("is_private", "id");
+CREATE INDEX IF NOT EXISTS "idx_access_toke_expirat_88ed93" ON "access_tokens" ("expiration");
+CREATE INDEX IF NOT EXISTS "idx_access_toke_user_id_d9e403" ON "access_tokens" ("user_id", "expiration");
+-- downgrade --
+DROP INDEX IF EXISTS "idx_access_toke_user_id_d9e403";
+DROP INDEX IF EXISTS "idx_access_toke_expirat_88ed93";
+DROP INDEX IF EXISTS "idx_collections_is_priv_e950d3";
+DROP INDEX IF EXISTS "idx_collections_owner_i_8415a6";
+DROP INDEX IF EXISTS "idx_cards_owner_i_fae56e";
+CREATE TABLE "collections_cards_old" (
+    "collections_id" INT NOT NULL REFERENCES "collections" ("id") ON DELETE SET NULL,
+    "cardtortoise_id" INT NOT NULL REFERENCES "cards" ("id") ON DELETE SET NULL
+);
+INSERT INTO "collections_cards_old" ("collections_id", "cardtortoise_id")
+    SELECT "collections_id", "cardtortoise_id" FROM "collections_cards";
+DROP TABLE "collections_cards";
+ALTER TABLE "collections_cards_old" RENAME TO "collections_cards";
@@ -0,0 +1,11 @@
+-- upgrade --
+CREATE VIRTUAL TABLE IF NOT EXISTS "cards_fts" USING fts5("title", "content", content="cards", content_rowid="id", tokenize="unicode61 remove_diacritics 2", prefix="2 3");
+CREATE TRIGGER IF NOT EXISTS "cards_fts_insert" AFTER INSERT ON "cards" BEGIN INSERT INTO "cards_fts" ("rowid", "title", "content") VALUES (new."id", new."title", new."content"); END;
+CREATE TRIGGER IF NOT EXISTS "cards_fts_delete" AFTER DELETE ON "cards" BEGIN INSERT INTO "cards_fts" ("cards_fts", "rowid", "title", "content") VALUES ('delete', old."id", old."title", old."content"); END;
+CREATE TRIGGER IF NOT EXISTS "cards_fts_update" AFTER UPDATE OF "title", "content" ON "cards" BEGIN INSERT INTO "cards_fts" ("cards_fts", "rowid", "title", "content") VALUES ('delete', old."id", old."title", old."content"); INSERT INTO "cards_fts" ("rowid", "title", "content") VALUES (new."id", new."title", new."content"); END;
+INSERT INTO "cards_fts" ("cards_fts") VALUES ('rebuild');
+-- downgrade --
+DROP TRIGGER IF EXISTS "cards_fts_update";
+DROP TRIGGER IF EXISTS "cards_fts_delete";
+DROP TRIGGER IF EXISTS "cards_fts_insert";
+DROP TABLE IF EXISTS "cards_fts";
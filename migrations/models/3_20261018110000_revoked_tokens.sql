@@ -0,0 +1,9 @@
+-- upgrade --
+CREATE TABLE IF NOT EXISTS "revoked_tokens" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "token_id" VARCHAR(32) NOT NULL UNIQUE,
+    "expiration" TIMESTAMP NOT NULL
+);
+CREATE INDEX IF NOT EXISTS "idx_revoked_tok_expirat_2ad035" ON "revoked_tokens" ("expiration");
+-- downgrade --
+DROP TABLE IF EXISTS "revoked_tokens";
@@ -32,7 +32,7 @@ test_collection_2 = {
     'is_private': False
 }
 
-test_card = {
+test_card: dict = {
     'title': 'test card with collections',
     'content': 'test content',
     'collections': []
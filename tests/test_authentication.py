@@ -1,8 +1,20 @@
+from datetime import timedelta
+
 import httpx
 import pytest
 from fastapi import status
+from prometheus_client import REGISTRY
+from tortoise import timezone
 
+from app import dependencies
+from app.config import config
+from app.dependencies import revoke_access_tokens, token_cache
+from app.models.authentication import AccessTokenTortoise, UserTortoise
+from app.routers import authentication
 from app.routers.authentication import authenticate
+from app.utils.rate_limit import MemoryStore, Rate, RateLimiter
+from app.utils.tasks import TokenPurger
+from app.utils.tokens import RevocationSet, read_signed_token
 from tests.conftest import test_user_1, test_user_2
 
 user: dict = {}
@@ -39,3 +51,177 @@ async def test_create_token(test_client: httpx.AsyncClient):
         'password': test_user_2['password']
     })
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_token_cache(test_client: httpx.AsyncClient):
+    token = (await test_client.post('/token', data={
+        'username': test_user_1['email'],
+        'password': test_user_1['password']
+    })).json()
+    headers = {'Authorization': f'Bearer {token["access_token"]}'}
+    hits = token_cache.hits
+
+    response = await test_client.get('/cards/', headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    response = await test_client.get('/cards/', headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert token_cache.hits == hits + 1
+
+    response = await test_client.post('/logout', headers=headers)
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    response = await test_client.get('/cards/', headers=headers)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_token_revoked_by_other_process(test_client: httpx.AsyncClient,
+                                              monkeypatch):
+    token = (await test_client.post('/token', data={
+        'username': test_user_1['email'],
+        'password': test_user_1['password']
+    })).json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    await test_client.get('/cards/', headers=headers)
+    cached = token_cache.get(token)
+
+    # another process logs out, its revocations are not loaded here yet
+    monkeypatch.setattr(dependencies, 'revoked_tokens', RevocationSet())
+    await revoke_access_tokens(token)
+    token_cache.set(token, cached)
+    revocations = RevocationSet()
+    monkeypatch.setattr(dependencies, 'revoked_tokens', revocations)
+    response = await test_client.get('/cards/', headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+
+    await revocations.load()
+    response = await test_client.get('/cards/', headers=headers)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_token_limit_per_user(test_client: httpx.AsyncClient,
+                                    monkeypatch):
+    monkeypatch.setattr(config, 'token_limit_per_user', 2)
+    headers = []
+    for _ in range(3):
+        token = (await test_client.post('/token', data={
+            'username': test_user_1['email'],
+            'password': test_user_1['password']
+        })).json()
+        headers.append({'Authorization': f'Bearer {token["access_token"]}'})
+
+    statuses = [(await test_client.get('/cards/', headers=h)).status_code
+                for h in headers]
+    assert statuses == [status.HTTP_401_UNAUTHORIZED,
+                        status.HTTP_200_OK, status.HTTP_200_OK]
+
+
+@pytest.mark.asyncio
+async def test_purge_expired_tokens(test_client: httpx.AsyncClient):
+    owner = await UserTortoise.get(email=test_user_1['email'])
+    await AccessTokenTortoise.bulk_create([
+        AccessTokenTortoise(access_token=f'expired{i}', user=owner,
+                            expiration=timezone.now() - timedelta(hours=1))
+        for i in range(5)
+    ])
+    live = await AccessTokenTortoise.filter(
+        expiration__gte=timezone.now()
+    ).count()
+
+    passes = REGISTRY.get_sample_value(
+        'flashcards_token_purge_duration_seconds_count'
+    )
+    purger = TokenPurger(interval=0, batch_size=2)
+    assert await purger.purge() == 5
+    assert purger.stats()['passes'] == 1
+    assert REGISTRY.get_sample_value(
+        'flashcards_token_purge_duration_seconds_count'
+    ) == (passes or 0) + 1
+    assert await AccessTokenTortoise.all().count() == live
+
+
+@pytest.mark.asyncio
+async def test_signed_token(test_client: httpx.AsyncClient, monkeypatch):
+    opaque_token = (await test_client.post('/token', data={
+        'username': test_user_1['email'],
+        'password': test_user_1['password']
+    })).json()['access_token']
+    monkeypatch.setattr(config, 'token_mode', 'signed')
+    monkeypatch.setattr(config, 'token_secret', 'secret' * 6)
+    token = (await test_client.post('/token', data={
+        'username': test_user_1['email'],
+        'password': test_user_1['password']
+    })).json()['access_token']
+    assert token.startswith('v1.')
+
+    async def get_token(*args, **kwargs):
+        raise AssertionError('signed token was looked up in database')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(AccessTokenTortoise, 'get', get_token)
+        response = await test_client.get(
+            '/cards/', headers={'Authorization': f'Bearer {token}'}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        response = await test_client.post(
+            '/collections/', json={'title': 'signed', 'description': ''},
+            headers={'Authorization': f'Bearer {token}'}
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+    response = await test_client.get(
+        '/cards/', headers={'Authorization': f'Bearer {opaque_token}'}
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    payload, signature = token.rsplit('.', 1)
+    response = await test_client.get('/cards/', headers={
+        'Authorization': f'Bearer {payload}.{signature[::-1]}'
+    })
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = await test_client.post(
+        '/logout', headers={'Authorization': f'Bearer {token}'}
+    )
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    response = await test_client.get(
+        '/cards/', headers={'Authorization': f'Bearer {token}'}
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    revocations = RevocationSet()
+    await revocations.load()
+    signed_token = read_signed_token(token)
+    assert signed_token is not None
+    assert signed_token.token_id in revocations
+
+
+@pytest.mark.asyncio
+async def test_rate_limit(test_client: httpx.AsyncClient, monkeypatch):
+    monkeypatch.setattr(authentication, 'rate_limiter', RateLimiter(
+        MemoryStore(max_keys=10), ip_rate=Rate(60, 5), email_rate=Rate(60, 2)
+    ))
+    checks = 0
+
+    async def count_checks(*args):
+        nonlocal checks
+        checks += 1
+        return False
+
+    monkeypatch.setattr(authentication, 'check_password', count_checks)
+    statuses = [(await test_client.post('/token', data={
+        'username': test_user_1['email'], 'password': 'wrong_password'
+    })).status_code for _ in range(3)]
+    assert statuses == [status.HTTP_401_UNAUTHORIZED] * 2 + [
+        status.HTTP_429_TOO_MANY_REQUESTS
+    ]
+    assert checks == 2
+
+    # other emails are limited by address
+    responses = [await test_client.post('/token', data={
+        'username': f'other{i}@example.com', 'password': 'wrong_password'
+    }) for i in range(3)]
+    assert responses[-1].status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert responses[-1].headers['Retry-After'] == '1'
+    response = await test_client.post('/register', json=test_user_2)
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
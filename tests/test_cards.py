@@ -1,3 +1,5 @@
+import json
+
 import httpx
 import pytest
 from fastapi import status
@@ -84,6 +86,37 @@ async def test_save_card_with_collections(test_client: httpx.AsyncClient):
     card.update(response.json())
 
 
+@pytest.mark.asyncio
+async def test_get_cards_with_collections(test_client: httpx.AsyncClient):
+    response = await test_client.get('/cards/', headers=header_user1)
+    assert response.status_code == status.HTTP_200_OK
+    cards = {c['id']: c for c in response.json()}
+    assert len(cards) == 2
+    assert cards[card['id']]['collections'] == card['collections']
+
+
+@pytest.mark.asyncio
+async def test_get_cards_with_cursor(test_client: httpx.AsyncClient):
+    ids = []
+    params: dict = {'limit': 1}
+    while True:
+        response = await test_client.get(
+            '/cards/', params=params, headers=header_user1
+        )
+        assert response.status_code == status.HTTP_200_OK
+        ids += [item['id'] for item in response.json()]
+        if 'X-Next-Cursor' not in response.headers:
+            break
+        params['cursor'] = response.headers['X-Next-Cursor']
+    assert len(ids) == 2
+    assert ids == sorted(ids)
+
+    response = await test_client.get(
+        '/cards/', params={'cursor': 'invalid'}, headers=header_user1
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
 @pytest.mark.asyncio
 async def test_update_collection(test_client: httpx.AsyncClient):
     test_card['collections'].pop()  # type: ignore
@@ -99,6 +132,20 @@ async def test_update_collection(test_client: httpx.AsyncClient):
     assert response.status_code == status.HTTP_403_FORBIDDEN
 
 
+@pytest.mark.asyncio
+async def test_update_collection_of_other_user(test_client: httpx.AsyncClient):
+    foreign_collection = (await test_client.post(
+        '/collections/', json=test_collection_1, headers=header_user2
+    )).json()
+    response = await test_client.put(
+        f'/cards/{card["id"]}',
+        json={'collections': [*test_card['collections'], foreign_collection]},
+        headers=header_user1
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['collections'] == test_card['collections']
+
+
 @pytest.mark.asyncio
 async def test_delete_card_with_collections(test_client: httpx.AsyncClient):
     response = await test_client.delete(
@@ -125,3 +172,148 @@ async def test_delete_card_without_collections(test_client: httpx.AsyncClient):
         f'/cards/{card["id"]}', headers=header_user1
     )
     assert response.status_code == status.HTTP_204_NO_CONTENT
+
+
+@pytest.mark.asyncio
+async def test_save_cards_in_bulk(test_client: httpx.AsyncClient):
+    collection = (await test_client.post(
+        '/collections/', json=test_collection_1, headers=header_user1
+    )).json()
+    foreign_collection = (await test_client.post(
+        '/collections/', json=test_collection_1, headers=header_user2
+    )).json()
+    cards = [
+        {'title': 'bulk card 1', 'content': 'content',
+         'collections': [collection, foreign_collection]},
+        {'title': 'bulk card 2'},
+        {'title': 'bulk card 3', 'content': 'content'},
+    ]
+
+    response = await test_client.post(
+        '/cards/bulk', json=cards, headers=header_user1
+    )
+    assert response.status_code == status.HTTP_200_OK
+    results = response.json()
+    assert [result['index'] for result in results] == [0, 1, 2]
+    assert results[0]['collections'] == [collection['id']]
+    assert results[1]['id'] is None and results[1]['errors']
+    assert results[2]['id'] == results[0]['id'] + 1
+
+    response = await test_client.get(
+        f'/cards/{results[0]["id"]}', headers=header_user1
+    )
+    assert response.json()['title'] == 'bulk card 1'
+    assert response.json()['collections'] == [collection]
+
+    ndjson = '\n'.join(json.dumps(card) for card in cards[2:]) + '\n{'
+    response = await test_client.post(
+        '/cards/bulk', content=ndjson, headers={
+            **header_user1, 'Content-Type': 'application/x-ndjson'
+        }
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert [bool(result['errors']) for result in response.json()] == [
+        False, True
+    ]
+
+    response = await test_client.post(
+        '/cards/bulk', json={'title': 'not a list'}, headers=header_user1
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio
+async def test_search_cards(test_client: httpx.AsyncClient):
+    public_collection = (await test_client.post(
+        '/collections/', json=test_collection_2, headers=header_user1
+    )).json()
+    ids = [result['id'] for result in (await test_client.post(
+        '/cards/bulk', json=[
+            {'title': 'Photosynthesis', 'content': 'Plants convert light',
+             'collections': [public_collection]},
+            {'title': 'Light', 'content': 'Photons and photosynthesis'},
+            {'title': 'Mitochondria', 'content': 'Powerhouse of the cell'},
+        ], headers=header_user1
+    )).json()]
+
+    response = await test_client.get(
+        '/cards/search', params={'q': 'photosynth'}, headers=header_user1
+    )
+    assert response.status_code == status.HTTP_200_OK
+    hits = response.json()
+    assert [hit['id'] for hit in hits] == ids[:2]
+    assert '<b>Photosynthesis</b>' in hits[0]['snippet']
+
+    response = await test_client.get(
+        '/cards/search', params={'q': 'photosynthesis', 'limit': 1},
+        headers=header_user1
+    )
+    assert [hit['id'] for hit in response.json()] == ids[:1]
+    response = await test_client.get('/cards/search', params={
+        'q': 'photosynthesis', 'limit': 1,
+        'cursor': response.headers['X-Next-Cursor']
+    }, headers=header_user1)
+    assert [hit['id'] for hit in response.json()] == ids[1:2]
+
+    response = await test_client.get(
+        '/cards/search', params={'q': 'photosynthesis'}, headers=header_user2
+    )
+    assert response.json() == []
+    response = await test_client.get(
+        '/cards/search', params={'q': 'photosynthesis',
+                                 'include_public': True},
+        headers=header_user2
+    )
+    assert [hit['id'] for hit in response.json()] == ids[:1]
+
+    await test_client.put(f'/cards/{ids[2]}', json={'content': 'Organelle'},
+                          headers=header_user1)
+    await test_client.delete(f'/cards/{ids[1]}', headers=header_user1)
+    for query, found in (('powerhouse', []), ('organelle', ids[2:]),
+                         ('photons', [])):
+        response = await test_client.get(
+            '/cards/search', params={'q': query}, headers=header_user1
+        )
+        assert [hit['id'] for hit in response.json()] == found
+
+
+@pytest.mark.asyncio
+async def test_delete_cards_in_bulk(test_client: httpx.AsyncClient):
+    collection = (await test_client.post(
+        '/collections/', json=test_collection_1, headers=header_user1
+    )).json()
+    ids = [result['id'] for result in (await test_client.post(
+        '/cards/bulk', json=[
+            {'title': 'in collection', 'content': '',
+             'collections': [collection]},
+            {'title': 'in collection', 'content': '',
+             'collections': [collection]},
+            {'title': 'alone', 'content': ''},
+            {'title': 'alone', 'content': ''},
+        ], headers=header_user1
+    )).json()]
+    foreign_id = (await test_client.post(
+        '/cards/', json={'title': 'foreign', 'content': ''},
+        headers=header_user2
+    )).json()['id']
+
+    response = await test_client.delete('/cards/', headers=header_user1)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    response = await test_client.delete(
+        '/cards/', params={'collection_id': collection['id']},
+        headers=header_user1
+    )
+    assert response.json() == {'deleted': 2}
+    response = await test_client.get(
+        f'/collections/private/{collection["id"]}', headers=header_user1
+    )
+    assert response.json()['cards'] == []
+
+    response = await test_client.delete(
+        '/cards/', params={'id': [*ids, foreign_id]}, headers=header_user1
+    )
+    assert response.json() == {'deleted': 2}
+    response = await test_client.get(f'/cards/{foreign_id}',
+                                     headers=header_user2)
+    assert response.status_code == status.HTTP_200_OK
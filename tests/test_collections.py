@@ -1,7 +1,17 @@
+import csv
+import io
+import json
+from datetime import timedelta
+
 import httpx
 import pytest
+import zstandard
 from fastapi import status
+from tortoise import timezone
 
+from app.config import config
+from app.models.models import CardTortoise, CollectionTortoise
+from app.utils.response_cache import response_cache
 from tests.conftest import (test_card, test_collection_1, test_collection_2,
                             test_user_1, test_user_2)
 
@@ -60,6 +70,7 @@ async def test_get_public_collections(test_client: httpx.AsyncClient):
     response = await test_client.get('/collections/public')
     assert response.status_code == status.HTTP_200_OK
     assert len(response.json()) == 1
+    assert response.json()[0]['owner'] == {'name': test_user_1['name']}
 
 
 @pytest.mark.asyncio
@@ -89,6 +100,11 @@ async def test_get_public_collection_by_id(test_client: httpx.AsyncClient):
     )
     assert response.status_code == status.HTTP_200_OK
 
+    response = await test_client.get(
+        f'/collections/public/{private_collection["id"]}'
+    )
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
 
 @pytest.mark.asyncio
 async def test_update_collection(test_client: httpx.AsyncClient):
@@ -145,3 +161,333 @@ async def test_delete_nonempty_collection(test_client: httpx.AsyncClient):
         f'/collections/{private_collection["id"]}', headers=header_user1
     )
     assert response.status_code == status.HTTP_204_NO_CONTENT
+
+
+@pytest.mark.asyncio
+async def test_get_collection_with_cards(test_client: httpx.AsyncClient):
+    collections = [
+        (await test_client.post(
+            '/collections/', json=collection, headers=header_user1
+        )).json()
+        for collection in (test_collection_1, test_collection_2)
+    ]
+    card_ids = [
+        (await test_client.post('/cards/', json={
+            'title': f'nested card {i}',
+            'content': 'nested content',
+            'collections': collections[:i + 1]
+        }, headers=header_user1)).json()['id']
+        for i in range(2)
+    ]
+
+    response = await test_client.get(
+        f'/collections/public/{collections[1]["id"]}'
+    )
+    assert response.status_code == status.HTTP_200_OK
+    cards = response.json()['cards']
+    assert [card['id'] for card in cards] == card_ids[1:]
+    assert cards[0]['collections'] == collections
+
+    response = await test_client.get(
+        f'/collections/private/{collections[0]["id"]}', headers=header_user1
+    )
+    assert response.status_code == status.HTTP_200_OK
+    cards = response.json()['cards']
+    assert [card['id'] for card in cards] == card_ids
+    assert [len(card['collections']) for card in cards] == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_export_collection(test_client: httpx.AsyncClient,
+                                 monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(config, 'export_chunk_size', 2)
+    collections = [
+        (await test_client.post(
+            '/collections/', json=collection, headers=header_user1
+        )).json()
+        for collection in (test_collection_1, test_collection_2)
+    ]
+    await test_client.post('/cards/bulk', json=[
+        {'title': f'export card {i}', 'content': 'line 1\nline 2',
+         'collections': collections}
+        for i in range(3)
+    ], headers=header_user1)
+
+    response = await test_client.get(
+        f'/collections/private/{collections[0]["id"]}/export',
+        headers=header_user1
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    assert response.headers['content-disposition'] == (
+        f'attachment; filename="collection-{collections[0]["id"]}.ndjson"'
+    )
+    cards = [json.loads(line) for line in response.text.splitlines()]
+    assert [card['title'] for card in cards] == [
+        f'export card {i}' for i in range(3)
+    ]
+    assert cards[0]['collections'] == collections
+
+    response = await test_client.get(
+        f'/collections/public/{collections[1]["id"]}/export',
+        params={'format': 'csv'}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers['content-type'].startswith('text/csv')
+    assert response.headers['content-disposition'] == (
+        f'attachment; filename="collection-{collections[1]["id"]}.csv"'
+    )
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row['content'] for row in rows] == ['line 1\nline 2'] * 3
+    assert rows[0]['collections'] == ' '.join(
+        str(collection['id']) for collection in collections
+    )
+
+    response = await test_client.get(
+        f'/collections/private/{collections[0]["id"]}/export',
+        headers=header_user2
+    )
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    response = await test_client.get(
+        f'/collections/public/{collections[0]["id"]}/export'
+    )
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.asyncio
+async def test_get_collection_conditionally(test_client: httpx.AsyncClient):
+    collections = [
+        (await test_client.post(
+            '/collections/', json=collection, headers=header_user1
+        )).json()
+        for collection in (test_collection_1, test_collection_2)
+    ]
+    card = (await test_client.post('/cards/', json={
+        'title': 'polled card', 'content': 'content',
+        'collections': collections[:1]
+    }, headers=header_user1)).json()
+    url = f'/collections/private/{collections[0]["id"]}'
+
+    response = await test_client.get(url, headers=header_user1)
+    etag = response.headers['ETag']
+    response = await test_client.get(url, headers={
+        **header_user1, 'If-None-Match': etag
+    })
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers['ETag'] == etag
+    assert response.content == b''
+    response = await test_client.get(url, headers={
+        **header_user1, 'If-Modified-Since': response.headers['Last-Modified']
+    })
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    # card joins another collection, which is listed in its representation
+    await test_client.put(f'/cards/{card["id"]}', json={
+        'collections': collections
+    }, headers=header_user1)
+    response = await test_client.get(url, headers={
+        **header_user1, 'If-None-Match': etag
+    })
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers['ETag'] != etag
+    assert response.json()['cards'][0]['collections'] == collections
+
+    # private and public representations of collection differ
+    response = await test_client.get(
+        f'/collections/private/{collections[1]["id"]}', headers=header_user1
+    )
+    response = await test_client.get(
+        f'/collections/public/{collections[1]["id"]}',
+        headers={'If-None-Match': response.headers['ETag']}
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    response = await test_client.get(f'/cards/{card["id"]}',
+                                     headers=header_user1)
+    response = await test_client.get(f'/cards/{card["id"]}', headers={
+        **header_user1, 'If-None-Match': response.headers['ETag']
+    })
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+@pytest.mark.asyncio
+async def test_modified_since_after_delete(test_client: httpx.AsyncClient):
+    collections = [
+        (await test_client.post(
+            '/collections/', json=collection, headers=header_user1
+        )).json()
+        for collection in (test_collection_1, test_collection_2)
+    ]
+    cards = [(await test_client.post('/cards/', json={
+        'title': title, 'content': 'content', 'collections': linked
+    }, headers=header_user1)).json() for title, linked in (
+        ('deleted card', collections[:1]), ('kept card', collections)
+    )]
+
+    async def backdate() -> None:
+        # dates have a precision of second, so changes go into later one
+        past = timezone.now() - timedelta(hours=1)
+        await CollectionTortoise.filter(
+            id__in=[col['id'] for col in collections]
+        ).update(last_update=past)
+        await CardTortoise.filter(
+            id__in=[card['id'] for card in cards]
+        ).update(last_update=past)
+
+    await backdate()
+    url = f'/collections/private/{collections[0]["id"]}'
+    last_modified = (await test_client.get(
+        url, headers=header_user1
+    )).headers['Last-Modified']
+    await test_client.delete(f'/cards/{cards[0]["id"]}', headers=header_user1)
+    response = await test_client.get(url, headers={
+        **header_user1, 'If-Modified-Since': last_modified
+    })
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()['cards']) == 1
+
+    await backdate()
+    url = f'/cards/{cards[1]["id"]}'
+    last_modified = (await test_client.get(
+        url, headers=header_user1
+    )).headers['Last-Modified']
+    await test_client.delete(f'/collections/{collections[1]["id"]}',
+                             headers=header_user1)
+    response = await test_client.get(url, headers={
+        **header_user1, 'If-Modified-Since': last_modified
+    })
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['collections'] == collections[:1]
+
+
+@pytest.mark.asyncio
+async def test_public_collection_cache(test_client: httpx.AsyncClient):
+    collection = (await test_client.post(
+        '/collections/', json=test_collection_2, headers=header_user1
+    )).json()
+    card = (await test_client.post('/cards/', json={
+        'title': 'cached card', 'content': 'content',
+        'collections': [collection]
+    }, headers=header_user1)).json()
+    url = f'/collections/public/{collection["id"]}'
+
+    first = await test_client.get(url)
+    hits = response_cache.hits
+    second = await test_client.get(url)
+    assert response_cache.hits == hits + 1
+    assert second.content == first.content
+    assert second.headers['ETag'] == first.headers['ETag']
+    response = await test_client.get(url, headers={
+        'If-None-Match': first.headers['ETag']
+    })
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    await test_client.put(f'/cards/{card["id"]}', json={
+        'title': 'changed card'
+    }, headers=header_user1)
+    response = await test_client.get(url)
+    assert response.json()['cards'][0]['title'] == 'changed card'
+    assert response.headers['ETag'] != first.headers['ETag']
+
+    listing = (await test_client.get('/collections/public')).json()
+    await test_client.put(f'/collections/{collection["id"]}', json={
+        'title': 'changed collection'
+    }, headers=header_user1)
+    response = await test_client.get('/collections/public')
+    assert response.json() != listing
+    assert 'changed collection' in {col['title'] for col in response.json()}
+
+
+@pytest.mark.asyncio
+async def test_bulk_import_into_cached_collection(
+    test_client: httpx.AsyncClient
+):
+    collection = (await test_client.post(
+        '/collections/', json=test_collection_2, headers=header_user1
+    )).json()
+    url = f'/collections/public/{collection["id"]}'
+    assert (await test_client.get(url)).json()['cards'] == []
+
+    results = (await test_client.post('/cards/bulk', json=[
+        {'title': f'imported card {i}', 'content': 'content',
+         'collections': [collection]}
+        for i in range(2)
+    ], headers=header_user1)).json()
+    # card ids differ from collection id, so only the right scope is dropped
+    assert collection['id'] not in {result['id'] for result in results}
+    response = await test_client.get(url)
+    assert [card['title'] for card in response.json()['cards']] == [
+        'imported card 0', 'imported card 1'
+    ]
+
+
+@pytest.mark.asyncio
+async def test_fast_serialization(test_client: httpx.AsyncClient,
+                                  monkeypatch):
+    collection = (await test_client.post(
+        '/collections/', json=test_collection_1, headers=header_user1
+    )).json()
+    await test_client.post('/cards/', json={
+        **test_card, 'collections': [collection]
+    }, headers=header_user1)
+    url = f'/collections/private/{collection["id"]}'
+    collection = await test_client.get(url, headers=header_user1)
+    cards = await test_client.get('/cards/?limit=1', headers=header_user1)
+
+    monkeypatch.setattr(config, 'fast_serialization', True)
+    response = await test_client.get(url, headers=header_user1)
+    assert response.json() == collection.json()
+    assert response.headers['ETag'] == collection.headers['ETag']
+    response = await test_client.get('/cards/?limit=1', headers=header_user1)
+    assert response.json() == cards.json()
+    assert response.headers['X-Next-Cursor'] == cards.headers['X-Next-Cursor']
+
+
+@pytest.mark.asyncio
+async def test_compression(test_client: httpx.AsyncClient):
+    collection = (await test_client.post(
+        '/collections/', json=test_collection_2, headers=header_user1
+    )).json()
+    await test_client.post('/cards/bulk', json=[
+        {'title': f'compressed card {i}', 'content': 'content ' * 100,
+         'collections': [collection]}
+        for i in range(20)
+    ], headers=header_user1)
+    url = f'/collections/public/{collection["id"]}'
+
+    plain = await test_client.get(url, headers={'Accept-Encoding': 'identity'})
+    assert 'content-encoding' not in plain.headers
+    response = await test_client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.headers['vary'] == 'Accept-Encoding'
+    assert response.num_bytes_downloaded < len(plain.content) / 10
+    assert response.json() == plain.json()
+    assert response.headers['ETag'] == f'W/{plain.headers["ETag"]}'
+
+    # httpx does not decode zstd, so body is decompressed here
+    response = await test_client.get(url, headers={
+        'Accept-Encoding': 'gzip, zstd'
+    })
+    assert response.headers['content-encoding'] == 'zstd'
+    assert len(response.content) < len(plain.content) / 10
+    body = zstandard.ZstdDecompressor().decompressobj().decompress(
+        response.content
+    )
+    assert json.loads(body) == plain.json()
+
+    response = await test_client.get(url, headers={
+        'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']
+    })
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert 'content-encoding' not in response.headers
+
+    response = await test_client.get('/collections/public?limit=1',
+                                     headers={'Accept-Encoding': 'gzip'})
+    assert 'content-encoding' not in response.headers
+
+    response = await test_client.get(f'{url}/export', params={
+        'format': 'csv'
+    }, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['content-encoding'] == 'gzip'
+    assert 'content-length' not in response.headers
+    assert len(list(csv.DictReader(io.StringIO(response.text)))) == 20
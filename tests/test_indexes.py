@@ -0,0 +1,90 @@
+import logging
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Iterator
+
+import httpx
+import pytest
+from tortoise import connections, timezone
+
+from app.models.authentication import AccessTokenTortoise
+from app.models.models import CardTortoise, CollectionTortoise
+from app.utils.conditional import get_card_version, get_collection_version
+from app.utils.loaders import (get_cards_collections, load_cards,
+                               load_collection_cards, load_public_collections)
+from app.utils.utils import Pagination, paginate
+
+
+class QueryCollector(logging.Handler):
+    """Collect SQL statements logged by tortoise database client."""
+
+    def __init__(self) -> None:
+        super().__init__(logging.DEBUG)
+        self.queries: list[tuple[str, list | None]] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.msg == '%s: %s':
+            self.queries.append(record.args)  # type: ignore
+
+
+@contextmanager
+def collect_queries() -> Iterator[QueryCollector]:
+    logger = logging.getLogger('tortoise.db_client')
+    collector = QueryCollector()
+    level = logger.level
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(collector)
+    try:
+        yield collector
+    finally:
+        logger.removeHandler(collector)
+        logger.setLevel(level)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('run_queries, indexes', [
+    (lambda: load_cards(
+        paginate(CardTortoise.filter(owner_id=1), Pagination(0, 10))
+     ), ['idx_cards_owner_i']),
+    (lambda: load_cards(
+        paginate(CardTortoise.filter(owner_id=1),
+                 Pagination(0, 10, {'id': 5}))
+     ), ['idx_cards_owner_i']),
+    (lambda: get_cards_collections([1, 2]), ['idx_collections_cardtor']),
+    (lambda: load_collection_cards(1),
+     ['sqlite_autoindex_collections_cards']),
+    (lambda: paginate(
+        CollectionTortoise.filter(owner_id=1), Pagination(0, 10)
+     ), ['idx_collections_owner_i']),
+    (lambda: load_public_collections(paginate(
+        CollectionTortoise.filter(is_private=False), Pagination(0, 10)
+     )), ['idx_collections_is_priv']),
+    (lambda: get_collection_version(
+        CollectionTortoise(id=1, last_update=timezone.now()), 'private'
+     ), ['sqlite_autoindex_collections_cards']),
+    (lambda: get_card_version(
+        CardTortoise(id=1, last_update=timezone.now())
+     ), ['idx_collections_cardtor']),
+    (lambda: AccessTokenTortoise.filter(expiration__lt=timezone.now()),
+     ['idx_access_toke_expirat']),
+    (lambda: AccessTokenTortoise.filter(
+        user_id=1, expiration__gte=timezone.now()
+     ), ['idx_access_toke_user_id']),
+])
+async def test_queries_use_indexes(test_client: httpx.AsyncClient,
+                                   run_queries: Callable[[], Awaitable],
+                                   indexes: list[str]):
+    with collect_queries() as collector:
+        await run_queries()
+    assert collector.queries
+
+    connection = connections.get('default')
+    plans = []
+    for query, values in collector.queries:
+        rows = await connection.execute_query_dict(
+            f'EXPLAIN QUERY PLAN {query}', values
+        )
+        plan = '\n'.join(row['detail'] for row in rows)
+        assert 'SCAN' not in plan, query
+        plans.append(plan)
+    for index in indexes:
+        assert index in plans[0]
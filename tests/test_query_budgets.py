@@ -0,0 +1,65 @@
+import re
+
+import httpx
+import pytest
+from fastapi import status
+
+from tests.conftest import test_collection_2, test_user_1
+
+context: dict = {}
+
+
+def get_query_count(response: httpx.Response) -> int:
+    """Return number of queries reported in Server-Timing header."""
+    match = re.search(r'desc="(\d+) queries"',
+                      response.headers['Server-Timing'])
+    assert match is not None
+    return int(match[1])
+
+
+@pytest.mark.asyncio
+async def test_server_timing(test_client: httpx.AsyncClient):
+    await test_client.post('/register', json=test_user_1)
+    token = (await test_client.post('/token', data={
+        'username': test_user_1['email'],
+        'password': test_user_1['password']
+    })).json()
+    headers = {'Authorization': f'Bearer {token["access_token"]}'}
+    collection = (await test_client.post(
+        '/collections/', json=test_collection_2, headers=headers
+    )).json()
+    for i in range(5):
+        card = (await test_client.post('/cards/', json={
+            'title': f'card {i}', 'content': 'content',
+            'collections': [collection]
+        }, headers=headers)).json()
+    context.update(headers=headers, collection=collection['id'],
+                   card=card['id'])
+
+    response = await test_client.get('/cards/', headers=headers)
+    metrics = [metric.split(';')[0] for metric
+               in response.headers['Server-Timing'].split(', ')]
+    assert metrics == ['db', 'auth', 'serialization', 'total']
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('method, url, budget', [
+    ('GET', '/cards/', 2),
+    ('GET', '/cards/{card}', 3),
+    ('GET', '/cards/search?q=card', 2),
+    ('PUT', '/cards/{card}', 4),
+    ('GET', '/collections/private', 1),
+    ('GET', '/collections/private/{collection}', 4),
+    ('GET', '/collections/public', 1),
+    ('GET', '/collections/public/{collection}', 4),
+    # served from response cache
+    ('GET', '/collections/public/{collection}', 0),
+])
+async def test_query_budget(test_client: httpx.AsyncClient, method: str,
+                            url: str, budget: int):
+    response = await test_client.request(
+        method, url.format(**context), headers=context['headers'],
+        json={'title': 'changed'} if method == 'PUT' else None
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert get_query_count(response) <= budget
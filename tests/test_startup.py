@@ -0,0 +1,125 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from aerich.models import Aerich
+
+from app.utils.startup import MIGRATIONS_DIR, check_migrations
+
+# Seconds from import of app to response of the first request of a worker
+# started in production mode, generous for slow machines.
+FIRST_REQUEST_BUDGET = 5
+
+FIRST_REQUEST_SCRIPT = '''
+import asyncio
+import json
+import time
+
+start = time.perf_counter()
+
+import httpx
+from asgi_lifespan import LifespanManager
+
+from app.main import app
+from app.utils.startup import startup_report
+
+
+async def main():
+    async with LifespanManager(app):
+        async with httpx.AsyncClient(app=app, base_url='http://app.io') as c:
+            response = await c.get('/collections/public')
+            elapsed = time.perf_counter() - start
+    print(json.dumps({'status': response.status_code, 'elapsed': elapsed,
+                      'phases': startup_report.phases}))
+
+
+asyncio.run(main())
+'''
+
+
+def get_migrations() -> list[str]:
+    return sorted((name for name in os.listdir(MIGRATIONS_DIR)
+                   if name.endswith('.sql')),
+                  key=lambda name: int(name.split('_', 1)[0]))
+
+
+def migrate(path: Path) -> None:
+    """Apply upgrades of all migrations like `aerich upgrade` does.
+
+    Initial migration lacks users and tokens, which were created by schema
+    generation, so upgrades are applied to generated schema.
+    """
+    db = sqlite3.connect(path)
+    for name in get_migrations():
+        sql = (MIGRATIONS_DIR / name).read_text()
+        db.executescript(sql.split('-- downgrade --')[0])
+        db.execute('INSERT INTO "aerich" ("version", "app", "content") '
+                   'VALUES (?, ?, ?)', [name, 'models', '{}'])
+    db.commit()
+    db.close()
+
+
+@pytest.mark.asyncio
+async def test_check_migrations(test_client):
+    # schema of tests is generated, so no migration is recorded
+    with pytest.raises(RuntimeError, match='aerich upgrade'):
+        await check_migrations()
+
+    *previous, latest = get_migrations()
+    await Aerich.create(version=previous[-1], app='models', content={})
+    with pytest.raises(RuntimeError, match=latest):
+        await check_migrations()
+
+    await Aerich.create(version=latest, app='models', content={})
+    await check_migrations()
+    await Aerich.all().delete()
+
+
+def run_worker(path: Path, mode: str) -> subprocess.CompletedProcess:
+    env = {**os.environ, 'SQLITE_HOST': f'sqlite://{path}',
+           'STARTUP_MODE': mode}
+    return subprocess.run([sys.executable, '-c', FIRST_REQUEST_SCRIPT],
+                          env=env, capture_output=True, text=True,
+                          cwd=Path(__file__).parents[1], timeout=60)
+
+
+def start_worker(path: Path, mode: str) -> dict:
+    """Start app in new process, return report of its first request."""
+    result = run_worker(path, mode)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_time_to_first_request(tmp_path):
+    path = tmp_path / 'db.sqlite3'
+    report = start_worker(path, 'development')
+    assert report['status'] == 200
+    assert 'schema' in report['phases']
+
+    migrate(path)
+    report = start_worker(path, 'production')
+    assert report['status'] == 200
+    assert report['elapsed'] < FIRST_REQUEST_BUDGET
+    assert 'migrations' in report['phases']
+    assert 'schema' not in report['phases']
+
+
+def test_development_checks_migrations(tmp_path):
+    path = tmp_path / 'db.sqlite3'
+    start_worker(path, 'development')
+    migrate(path)
+    assert start_worker(path, 'development')['status'] == 200
+
+    # database under migrations is not upgraded by schema generation
+    db = sqlite3.connect(path)
+    db.execute('DELETE FROM "aerich" WHERE "version" = ?',
+               [get_migrations()[-1]])
+    db.commit()
+    db.close()
+    result = run_worker(path, 'development')
+    assert result.returncode != 0
+    assert 'aerich upgrade' in result.stderr
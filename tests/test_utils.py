@@ -0,0 +1,249 @@
+import asyncio
+import gzip
+import threading
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+from fastapi import HTTPException, status
+from prometheus_client import REGISTRY
+from prometheus_client.parser import text_string_to_metric_families
+from tortoise import connections
+
+from app.config import Config, config
+from app.utils.cache import TTLCache
+from app.utils.compression import CompressionResponder, choose_encoding
+from app.utils.database import (ReadRoutingMiddleware, get_reader_connections,
+                                in_write_transaction, read_connection)
+from app.utils.passwords import HashingPool
+from app.utils.rate_limit import MemoryStore, Rate, SqliteStore
+from app.utils.response_cache import (CachedResponse, MemoryBackend,
+                                      ResponseCache, SqliteBackend)
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.stats() == {'hits': 2, 'misses': 1, 'size': 2}
+
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    now = time.monotonic()
+    monkeypatch.setattr(time, 'monotonic', lambda: now + 61)
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_hashing_pool_rejects_when_saturated():
+    pool = HashingPool(max_workers=1, queue_limit=1)
+    release = threading.Event()
+    jobs = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await pool.run(release.wait)
+    assert exc_info.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+    release.set()
+    assert await asyncio.gather(*jobs) == [True, True]
+    assert pool.pending == 0
+
+
+def test_database_url_applies_pragmas():
+    config = Config(sqlite_host='sqlite://db.sqlite3?synchronous=FULL')
+    params = dict(parse_qsl(urlsplit(config.database_url).query))
+    assert params['journal_mode'] == 'WAL'
+    assert params['busy_timeout'] == '5000'
+    assert params['synchronous'] == 'FULL'
+
+
+@pytest.mark.asyncio
+async def test_connection_pragmas(test_client):
+    connection = connections.get('default')
+    for pragma, value in (('synchronous', 1), ('temp_store', 2),
+                          ('busy_timeout', config.sqlite_busy_timeout),
+                          ('cache_size', config.sqlite_cache_size)):
+        rows = await connection.execute_query_dict(f'PRAGMA {pragma}')
+        assert list(rows[0].values()) == [value]
+
+
+def test_reader_connections():
+    assert get_reader_connections('sqlite://:memory:', 2) == {}
+    readers = get_reader_connections('sqlite:///tmp/db.sqlite3?cache_size=1',
+                                     2)
+    assert list(readers) == ['reader_0', 'reader_1']
+    assert readers['reader_0'] == (
+        'sqlite:///tmp/db.sqlite3?cache_size=1&query_only=ON'
+    )
+
+
+@pytest.mark.asyncio
+async def test_read_routing_middleware(monkeypatch):
+    chosen = []
+
+    async def app(scope, receive, send):
+        chosen.append(read_connection.get())
+
+    middleware = ReadRoutingMiddleware(app, ['reader_0', 'reader_1'])
+    monkeypatch.setattr(middleware, 'choose_reader', lambda: 'reader_1')
+    for method in ('GET', 'POST'):
+        await middleware({'type': 'http', 'method': method}, None, None)
+    assert chosen == ['reader_1', None]
+    assert read_connection.get() is None
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_bounds_size():
+    backend = MemoryBackend(max_bytes=10)
+    await backend.set('a', 's', 0, b'12345')
+    await backend.set('b', 's', 0, b'12345')
+    assert await backend.get('a', 's') == b'12345'
+    await backend.set('c', 's', 0, b'12345')
+    assert await backend.get('b', 's') is None
+    assert backend.size == 10
+
+    # value built before invalidation is not stored
+    await backend.invalidate('s')
+    assert await backend.get('a', 's') is None
+    await backend.set('a', 's', 0, b'12345')
+    assert await backend.get('a', 's') is None
+
+
+@pytest.mark.asyncio
+async def test_sqlite_backend(tmp_path):
+    backend = SqliteBackend(str(tmp_path / 'cache.sqlite3'), max_bytes=10)
+    await backend.set('a', 's', 0, b'12345')
+    await backend.set('b', 's', 0, b'12345')
+    await backend.get('a', 's')
+    await backend.set('c', 't', 0, b'12345')
+    assert await backend.get('a', 's') == b'12345'
+    assert await backend.get('b', 's') is None
+
+    await backend.invalidate('s')
+    assert await backend.generation('s') == 1
+    assert await backend.get('a', 's') is None
+    assert await backend.get('c', 't') == b'12345'
+    await backend.close()
+
+
+@pytest.mark.asyncio
+async def test_response_cache_coalesces_builds():
+    cache = ResponseCache(MemoryBackend(max_bytes=1024))
+    builds = 0
+
+    async def build():
+        nonlocal builds
+        builds += 1
+        await asyncio.sleep(0.01)
+        return CachedResponse(body=b'{}', headers={'etag': '"1"'})
+
+    responses = await asyncio.gather(*(
+        cache.get_or_build('key', 'scope', build) for _ in range(5)
+    ))
+    assert builds == 1
+    assert responses == [CachedResponse(b'{}', {'etag': '"1"'})] * 5
+    assert await cache.get_or_build('key', 'scope', build) == responses[0]
+    assert builds == 1
+
+
+@pytest.mark.asyncio
+async def test_metrics(test_client):
+    await test_client.get('/collections/public')
+    await test_client.get('/docs')
+    await test_client.get('/metrics')
+    response = await test_client.get('/metrics')
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers['content-type'].startswith('text/plain')
+    samples = {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for family in text_string_to_metric_families(response.text)
+        for sample in family.samples
+    }
+    assert samples[('flashcards_http_request_duration_seconds_count', (
+        ('method', 'GET'), ('route', '/collections/public'),
+        ('status', '200')
+    ))] >= 1
+    for route in ('/docs', '/metrics'):
+        assert samples[('flashcards_http_request_duration_seconds_count', (
+            ('method', 'GET'), ('route', route), ('status', '200')
+        ))] >= 1
+    assert samples[('flashcards_http_requests_in_flight', ())] == 1
+    assert samples[('flashcards_sqlite_bytes', (('kind', 'database'),))] > 0
+    assert ('flashcards_cache_requests_total',
+            (('cache', 'response'), ('result', 'miss'))) in samples
+
+
+@pytest.mark.asyncio
+async def test_pending_queries(test_client):
+    def pending() -> float | None:
+        return REGISTRY.get_sample_value('flashcards_db_connection_queries',
+                                         {'connection': 'default'})
+
+    client = connections.get('default')
+    async with in_write_transaction() as connection:
+        # query outside of transaction waits for it to finish
+        waiting = asyncio.create_task(client.execute_query('SELECT 1'))
+        await asyncio.sleep(0.05)
+        assert pending() == 1
+        await connection.execute_query('SELECT 1')
+        assert pending() == 1
+    await waiting
+    assert pending() == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('store', ['memory', 'sqlite'])
+async def test_bucket_store_refills(store, tmp_path):
+    store = MemoryStore(max_keys=10) if store == 'memory' \
+        else SqliteStore(str(tmp_path / 'buckets.sqlite3'))
+    rate = Rate(per_minute=60, burst=2)
+    assert [await store.take('key', rate, 0) for _ in range(3)] == [0, 0, 1]
+    assert await store.take('key', rate, 0.5) == 0.5
+    assert await store.take('key', rate, 1) == 0
+    assert await store.take('other', rate, 1) == 0
+    await store.close()
+
+
+@pytest.mark.parametrize('accept_encoding, encoding', [
+    ('gzip, deflate, br', 'gzip'),
+    ('gzip, zstd', 'zstd'),
+    ('zstd;q=0.5, gzip', 'gzip'),
+    ('zstd;q=0, *', 'gzip'),
+    ('identity', None),
+    ('gzip;q=0', None),
+    ('', None),
+])
+def test_choose_encoding(accept_encoding, encoding):
+    assert choose_encoding(accept_encoding, ('zstd', 'gzip')) == encoding
+
+
+@pytest.mark.asyncio
+async def test_compression_responder_streams():
+    messages: list[dict] = []
+
+    async def send(message):
+        messages.append(message)
+
+    # every chunk is compressed in a thread
+    responder = CompressionResponder(send, 'gzip', minimum_size=1024,
+                                     thread_size=0)
+    await responder.send({'type': 'http.response.start', 'status': 200,
+                          'headers': [(b'content-type', b'text/csv')]})
+    chunks = [f'{i},card\n'.encode() * 100 for i in range(3)]
+    for i, chunk in enumerate(chunks):
+        await responder.send({'type': 'http.response.body', 'body': chunk,
+                              'more_body': i < len(chunks) - 1})
+
+    assert (b'content-encoding', b'gzip') in messages[0]['headers']
+    assert not messages[-1]['more_body']
+    assert gzip.decompress(
+        b''.join(message['body'] for message in messages[1:])
+    ) == b''.join(chunks)